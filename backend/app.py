@@ -4,8 +4,9 @@ import shutil
 from contextlib import asynccontextmanager
 import os
 from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Generator, List, Optional
+from typing import Any, Dict, Generator, List, Optional, Tuple
 
 from fastapi import (
     Depends,
@@ -22,7 +23,7 @@ from fastapi import (
     status,
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
@@ -184,6 +185,26 @@ def _user_to_schema(user: User) -> UserRead:
     return payload
 
 
+def _parse_date_filters(
+    start_date: Optional[str], end_date: Optional[str]
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    start_at = None
+    end_at = None
+    if start_date:
+        try:
+            start_at = parse_myt_range_value(start_date, is_range_end=False)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail="Invalid start_date") from exc
+    if end_date:
+        try:
+            end_at = parse_myt_range_value(end_date, is_range_end=True)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail="Invalid end_date") from exc
+    if start_at and end_at and end_at < start_at:
+        raise HTTPException(status_code=400, detail="end_date must be after start_date")
+    return start_at, end_at
+
+
 def _get_user_from_cookie(session: Session, token: Optional[str]) -> Optional[User]:
     if not token:
         return None
@@ -655,20 +676,7 @@ def bank_transactions_api(
     safe_limit = max(1, min(limit, 200))
     safe_page = max(1, page)
     offset = (safe_page - 1) * safe_limit
-    start_at = None
-    end_at = None
-    if start_date:
-        try:
-            start_at = parse_myt_range_value(start_date, is_range_end=False)
-        except ValueError as exc:
-            raise HTTPException(status_code=400, detail="Invalid start_date") from exc
-    if end_date:
-        try:
-            end_at = parse_myt_range_value(end_date, is_range_end=True)
-        except ValueError as exc:
-            raise HTTPException(status_code=400, detail="Invalid end_date") from exc
-    if start_at and end_at and end_at < start_at:
-        raise HTTPException(status_code=400, detail="end_date must be after start_date")
+    start_at, end_at = _parse_date_filters(start_date, end_date)
     return crud.get_bank_ledger(
         ctx.session,
         limit=safe_limit,
@@ -679,6 +687,26 @@ def bank_transactions_api(
     )
 
 
+@app.get("/api/bank/transactions/export")
+def bank_transactions_export_api(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    search: Optional[str] = None,
+    ctx: StaffContext = Depends(require_staff_context),
+):
+    ensure_permission(ctx, "records.view")
+    start_at, end_at = _parse_date_filters(start_date, end_date)
+    bind = ctx.session.get_bind()
+
+    def iter_lines():
+        # the request-scoped session is closed before the body streams, so read with our own
+        with Session(bind) as session:
+            for entry in crud.iter_bank_transactions(session, start_at=start_at, end_at=end_at, search=search):
+                yield entry.model_dump_json() + "\n"
+
+    return StreamingResponse(iter_lines(), media_type="application/x-ndjson")
+
+
 @app.post("/api/bank/transactions/manual", response_model=BankTransactionRead, status_code=201)
 def bank_manual_adjust_api(
     payload: BankManualAdjustmentRequest,
@@ -699,20 +727,7 @@ def operation_logs_api(
     ctx: StaffContext = Depends(require_staff_context),
 ):
     ensure_permission(ctx, "operationlog.view")
-    start_at = None
-    end_at = None
-    if start_date:
-        try:
-            start_at = parse_myt_range_value(start_date, is_range_end=False)
-        except ValueError as exc:
-            raise HTTPException(status_code=400, detail="Invalid start_date") from exc
-    if end_date:
-        try:
-            end_at = parse_myt_range_value(end_date, is_range_end=True)
-        except ValueError as exc:
-            raise HTTPException(status_code=400, detail="Invalid end_date") from exc
-    if start_at and end_at and end_at < start_at:
-        raise HTTPException(status_code=400, detail="end_date must be after start_date")
+    start_at, end_at = _parse_date_filters(start_date, end_date)
     logs = crud.list_operation_logs(
         ctx.session,
         limit=limit,
@@ -732,20 +747,7 @@ def overall_report_api(
     ctx: StaffContext = Depends(require_staff_context),
 ):
     ensure_permission(ctx, "reports.view")
-    start_at = None
-    end_at = None
-    if start_date:
-        try:
-            start_at = parse_myt_range_value(start_date, is_range_end=False)
-        except ValueError as exc:
-            raise HTTPException(status_code=400, detail="Invalid start_date") from exc
-    if end_date:
-        try:
-            end_at = parse_myt_range_value(end_date, is_range_end=True)
-        except ValueError as exc:
-            raise HTTPException(status_code=400, detail="Invalid end_date") from exc
-    if start_at and end_at and end_at < start_at:
-        raise HTTPException(status_code=400, detail="end_date must be after start_date")
+    start_at, end_at = _parse_date_filters(start_date, end_date)
     return crud.get_overall_report(ctx.session, start_at=start_at, end_at=end_at)
 
 
@@ -770,8 +772,7 @@ def customer_profile(ctx: CustomerContext = Depends(require_customer_context)):
 
 @app.get("/customer/api/loans", response_model=List[LoanRead])
 def customer_loans(ctx: CustomerContext = Depends(require_customer_context)):
-    loans = ctx.session.exec(select(Loan).where(Loan.customer_id == ctx.customer.id)).all()
-    return [crud.to_loan_read(ctx.session, loan) for loan in loans]
+    return crud.list_customer_loans(ctx.session, ctx.customer.id)
 
 
 @app.get("/customer/api/repayments", response_model=List[RepaymentRead])
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import os
-import json
 from datetime import datetime, timezone
 from typing import Dict, Iterable, List, Optional, Sequence
 
@@ -15,11 +14,12 @@ from .security import (
     create_refresh_token,
     generate_session_token,
     hash_password,
+    legacy_session_token_hash,
     session_expiry_datetime,
     session_token_hash,
     verify_password,
 )
-from .timezone_utils import now_myt
+from .timezone_utils import MYT, now_myt
 
 DEFAULT_ADMIN_USERNAME = os.getenv("BACKEND_ADMIN_USERNAME", "admin")
 DEFAULT_ADMIN_PASSWORD = os.getenv("BACKEND_ADMIN_PASSWORD", "admin123")
@@ -31,25 +31,20 @@ def list_permission_definitions() -> List:
     return PERMISSIONS
 
 
-def _serialize_permissions(payload: Optional[Dict[str, bool]], role: UserRole) -> Optional[str]:
+def _serialize_permissions(payload: Optional[Dict[str, bool]], role: UserRole) -> Optional[Dict[str, bool]]:
     if role == UserRole.ADMIN:
         return None
     if payload is None:
         return None
-    sanitized = sanitize_permissions(payload)
-    return json.dumps(sanitized, ensure_ascii=False)
+    return sanitize_permissions(payload)
 
 
 def get_effective_permissions(user: User) -> Dict[str, bool]:
     if user.role == UserRole.ADMIN:
         return {key: True for key in ALL_PERMISSION_KEYS}
-    if not user.permissions_json:
-        return {}
-    try:
-        payload = json.loads(user.permissions_json)
-    except (TypeError, json.JSONDecodeError):
+    if not isinstance(user.permissions_json, dict):
         return {}
-    return sanitize_permissions(payload)
+    return sanitize_permissions(user.permissions_json)
 
 
 def _normalize_username(username: str) -> str:
@@ -216,16 +211,35 @@ def authenticate_user(
 def create_session_token(session: Session, user: User) -> str:
     raw_token = generate_session_token()
     hashed = session_token_hash(raw_token)
-    expires_at = session_expiry_datetime()
-    record = SessionToken(token_hash=hashed, user_id=user.id, expires_at=expires_at)
+    now = datetime.now(timezone.utc)
+    record = SessionToken(
+        token_hash=hashed,
+        user_id=user.id,
+        expires_at=session_expiry_datetime(now=now),
+        created_at=now.astimezone(MYT),
+    )
     session.add(record)
     session.commit()
     return raw_token
 
 
-def revoke_session_token(session: Session, raw_token: str) -> None:
+def _find_session_token(session: Session, raw_token: str) -> Optional[SessionToken]:
     hashed = session_token_hash(raw_token)
     record = session.exec(select(SessionToken).where(SessionToken.token_hash == hashed)).first()
+    if record is not None:
+        return record
+    legacy_hash = legacy_session_token_hash(raw_token)
+    record = session.exec(select(SessionToken).where(SessionToken.token_hash == legacy_hash)).first()
+    if record is not None:
+        # upgrade the row on first use so the SHA-256 fallback dies out with the old sessions
+        record.token_hash = hashed
+        session.add(record)
+        session.commit()
+    return record
+
+
+def revoke_session_token(session: Session, raw_token: str) -> None:
+    record = _find_session_token(session, raw_token)
     if not record:
         return
     record.revoked = True
@@ -236,8 +250,7 @@ def revoke_session_token(session: Session, raw_token: str) -> None:
 def get_user_by_session_token(session: Session, raw_token: str) -> Optional[User]:
     if not raw_token:
         return None
-    hashed = session_token_hash(raw_token)
-    record = session.exec(select(SessionToken).where(SessionToken.token_hash == hashed)).first()
+    record = _find_session_token(session, raw_token)
     if not record or record.revoked:
         return None
     expires_at = record.expires_at
@@ -257,6 +270,7 @@ def get_user_by_session_token(session: Session, raw_token: str) -> Optional[User
 def issue_customer_tokens(user: User) -> dict:
     if user.role != UserRole.CUSTOMER:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not a customer account")
-    access_token = create_access_token({"sub": str(user.id), "role": user.role.value})
-    refresh_token = create_refresh_token(str(user.id))
+    now = datetime.now(timezone.utc)
+    access_token = create_access_token({"sub": str(user.id), "role": user.role.value}, now=now)
+    refresh_token = create_refresh_token(str(user.id), now=now)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
@@ -2,14 +2,14 @@ from __future__ import annotations
 
 import math
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, List, Optional, Sequence, Set
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set
 
 import secrets
 import string
-import json
 import re
 from fastapi import HTTPException
-from sqlalchemy import func, or_
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import aliased
 from sqlmodel import Session, select
 
 from .models import Customer, Loan, Repayment, OperationLog, CompoundBalanceEvent, BankTransaction
@@ -214,7 +214,7 @@ def _record_balance_event(
         change_amount=_round_amount(change_amount),
         balance_after=_round_amount(max(customer.projected_balance or 0.0, 0.0)),
         description=description,
-        metadata_json=json.dumps(payload, ensure_ascii=False) if payload else None,
+        metadata_json=payload or None,
     )
     session.add(event)
     session.flush([event])
@@ -241,7 +241,7 @@ def _ensure_balance_event_baseline(session: Session, customer: Customer) -> None
         change_amount=balance,
         balance_after=balance,
         description="初始化复利余额",
-        metadata_json=json.dumps({"source": "baseline"}, ensure_ascii=False),
+        metadata_json={"source": "baseline"},
     )
     session.add(baseline)
     session.commit()
@@ -293,23 +293,18 @@ def _log_operation(
         entity_id=entity_id,
         action=action,
         description=description,
-        metadata_json=json.dumps(metadata_payload, ensure_ascii=False) if metadata_payload else None,
     )
+    # resolve the i18n payload once here so listings can hand the stored dict out as-is
+    resolved = _infer_log_i18n_metadata(log, metadata_payload) or {}
+    if "_i18n_key" not in resolved and "_i18n_list" not in resolved:
+        # marks the row as resolved even when no translation applies
+        resolved["_i18n_key"] = None
+    log.metadata_json = resolved
     session.add(log)
     session.flush([log])
     return log
 
 
-def _decode_metadata(metadata_json: Optional[str]) -> Optional[dict]:
-    if not metadata_json:
-        return None
-    try:
-        value = json.loads(metadata_json)
-        return value if isinstance(value, dict) else None
-    except json.JSONDecodeError:
-        return None
-
-
 def _infer_log_i18n_metadata(log: OperationLog, metadata: Optional[dict]) -> Optional[dict]:
     metadata_copy = dict(metadata) if metadata else {}
     if metadata_copy.get("_i18n_key") or metadata_copy.get("_i18n_list"):
@@ -371,21 +366,36 @@ def _infer_log_i18n_metadata(log: OperationLog, metadata: Optional[dict]) -> Opt
     return metadata_copy or None
 
 
+def _ranked_operation_logs(entity_type: str, entity_ids: Optional[List[int]] = None):
+    """Operation logs of one entity type numbered newest-first per entity (rn = 1 is the latest)."""
+    rank = func.row_number().over(
+        partition_by=OperationLog.entity_id,
+        order_by=(OperationLog.created_at.desc(), OperationLog.id.desc()),
+    )
+    stmt = select(OperationLog, rank.label("rn")).where(OperationLog.entity_type == entity_type)
+    if entity_ids is not None:
+        stmt = stmt.where(OperationLog.entity_id.in_(entity_ids))
+    return stmt.subquery()
+
+
 def _latest_operation_map(session: Session, entity_type: str, entity_ids: List[Optional[int]]) -> Dict[int, OperationLog]:
     ids = [item for item in entity_ids if item]
     if not ids:
         return {}
-    stmt = (
-        select(OperationLog)
-        .where(OperationLog.entity_type == entity_type, OperationLog.entity_id.in_(ids))
-        .order_by(OperationLog.created_at.desc())
+    ranked = _ranked_operation_logs(entity_type, ids)
+    latest_log = aliased(OperationLog, ranked)
+    rows = session.exec(select(latest_log).where(ranked.c.rn == 1)).all()
+    return {row.entity_id: row for row in rows if row.entity_id}
+
+
+def _select_with_latest_log(model, entity_type: str):
+    """Select ``model`` rows paired with their latest operation log (or None) in one statement."""
+    ranked = _ranked_operation_logs(entity_type)
+    latest_log = aliased(OperationLog, ranked)
+    return select(model, latest_log).outerjoin(
+        latest_log,
+        and_(latest_log.entity_id == model.id, ranked.c.rn == 1),
     )
-    rows = session.exec(stmt).all()
-    latest: Dict[int, OperationLog] = {}
-    for row in rows:
-        if row.entity_id and row.entity_id not in latest:
-            latest[row.entity_id] = row
-    return latest
 
 
 def _apply_compound_growth(customer: Customer, now: datetime, *, session: Optional[Session] = None) -> bool:
@@ -545,6 +555,25 @@ def _loan_remaining_compounded_balance(
     return max(_round_amount(remaining), 0.0)
 
 
+def _loans_remaining_compounded_balances(session: Session, loans: Sequence[Loan]) -> Dict[int, float]:
+    loan_ids = [loan.id for loan in loans if loan.id]
+    if not loan_ids:
+        return {}
+    paid_rows = session.exec(
+        select(Repayment.loan_id, func.coalesce(func.sum(func.abs(Repayment.repayment_amount)), 0))
+        .where(Repayment.loan_id.in_(loan_ids))
+        .group_by(Repayment.loan_id)
+    ).all()
+    paid_totals = {loan_id: float(total or 0.0) for loan_id, total in paid_rows}
+    balances: Dict[int, float] = {}
+    for loan in loans:
+        if not loan.id:
+            continue
+        remaining = _initial_compounded_amount(loan.loan_amount) - paid_totals.get(loan.id, 0.0)
+        balances[loan.id] = max(_round_amount(remaining), 0.0)
+    return balances
+
+
 def _ensure_repayment_within_loan_balance(
     session: Session,
     loan: Loan,
@@ -595,15 +624,28 @@ def list_customers(session: Session) -> List[Customer]:
 
 
 def list_loans(session: Session) -> List[LoanRead]:
-    loan_rows = session.exec(select(Loan).order_by(Loan.loan_date.desc())).all()
-    latest = _latest_operation_map(session, "loan", [loan.id for loan in loan_rows])
-    return [to_loan_read(session, loan, latest.get(loan.id)) for loan in loan_rows]
+    rows = session.exec(_select_with_latest_log(Loan, "loan").order_by(Loan.loan_date.desc())).all()
+    balances = _loans_remaining_compounded_balances(session, [loan for loan, _ in rows])
+    return [
+        to_loan_read(session, loan, log, remaining_balance=balances.get(loan.id), resolved_log=True)
+        for loan, log in rows
+    ]
+
+
+def list_customer_loans(session: Session, customer_id: int) -> List[LoanRead]:
+    rows = session.exec(_select_with_latest_log(Loan, "loan").where(Loan.customer_id == customer_id)).all()
+    balances = _loans_remaining_compounded_balances(session, [loan for loan, _ in rows])
+    return [
+        to_loan_read(session, loan, log, remaining_balance=balances.get(loan.id), resolved_log=True)
+        for loan, log in rows
+    ]
 
 
 def list_repayments(session: Session) -> List[RepaymentRead]:
-    repayment_rows = session.exec(select(Repayment).order_by(Repayment.repayment_date.desc())).all()
-    latest = _latest_operation_map(session, "repayment", [row.id for row in repayment_rows])
-    return [to_repayment_read(session, repayment, latest.get(repayment.id)) for repayment in repayment_rows]
+    rows = session.exec(
+        _select_with_latest_log(Repayment, "repayment").order_by(Repayment.repayment_date.desc())
+    ).all()
+    return [to_repayment_read(session, repayment, log, resolved_log=True) for repayment, log in rows]
 
 
 def list_operation_logs(
@@ -1396,6 +1438,51 @@ def delete_repayment(session: Session, repayment_id: int) -> RepaymentRead:
     return response
 
 
+# column-level selects skip ORM instance construction for read-only ledger listings
+_BANK_TX_COLUMNS = (
+    BankTransaction.id,
+    BankTransaction.transaction_type,
+    BankTransaction.amount,
+    BankTransaction.balance_after,
+    BankTransaction.reference_type,
+    BankTransaction.reference_id,
+    BankTransaction.customer_id,
+    BankTransaction.note,
+    BankTransaction.created_at,
+)
+
+
+def _apply_bank_transaction_filters(
+    query,
+    *,
+    start_at: Optional[datetime] = None,
+    end_at: Optional[datetime] = None,
+    search: Optional[str] = None,
+):
+    if start_at is not None:
+        query = query.where(BankTransaction.created_at >= start_at)
+    if end_at is not None:
+        query = query.where(BankTransaction.created_at <= end_at)
+    if search:
+        trimmed = search.strip()
+        if trimmed:
+            pattern = f"%{trimmed}%"
+            conditions = [
+                BankTransaction.transaction_type.ilike(pattern),
+                BankTransaction.note.ilike(pattern),
+                BankTransaction.reference_type.ilike(pattern),
+            ]
+            try:
+                search_id = int(trimmed)
+            except ValueError:
+                search_id = None
+            if search_id is not None:
+                conditions.append(BankTransaction.reference_id == search_id)
+                conditions.append(BankTransaction.customer_id == search_id)
+            query = query.where(or_(*conditions))
+    return query
+
+
 def list_bank_transactions(
     session: Session,
     *,
@@ -1404,50 +1491,46 @@ def list_bank_transactions(
     start_at: Optional[datetime] = None,
     end_at: Optional[datetime] = None,
     search: Optional[str] = None,
-) -> tuple[List[BankTransaction], int]:
+) -> tuple[List[BankTransactionRead], int]:
     safe_limit = max(1, min(limit, 200))
     safe_offset = max(0, offset)
-    stmt = select(BankTransaction)
-    count_stmt = select(func.count(BankTransaction.id))
-
-    def apply_common_filters(query):
-        if start_at is not None:
-            query = query.where(BankTransaction.created_at >= start_at)
-        if end_at is not None:
-            query = query.where(BankTransaction.created_at <= end_at)
-        if search:
-            trimmed = search.strip()
-            if trimmed:
-                pattern = f"%{trimmed}%"
-                conditions = [
-                    BankTransaction.transaction_type.ilike(pattern),
-                    BankTransaction.note.ilike(pattern),
-                    BankTransaction.reference_type.ilike(pattern),
-                ]
-                try:
-                    search_id = int(trimmed)
-                except ValueError:
-                    search_id = None
-                if search_id is not None:
-                    conditions.append(BankTransaction.reference_id == search_id)
-                    conditions.append(BankTransaction.customer_id == search_id)
-                query = query.where(or_(*conditions))
-        return query
-
-    stmt = apply_common_filters(stmt)
-    count_stmt = apply_common_filters(count_stmt)
+    filters = {"start_at": start_at, "end_at": end_at, "search": search}
+    stmt = _apply_bank_transaction_filters(select(*_BANK_TX_COLUMNS), **filters)
+    count_stmt = _apply_bank_transaction_filters(select(func.count(BankTransaction.id)), **filters)
 
     stmt = (
         stmt.order_by(BankTransaction.created_at.asc(), BankTransaction.id.asc())
         .offset(safe_offset)
         .limit(safe_limit)
     )
-    entries = session.exec(stmt).all()
+    entries = [to_bank_transaction_read(row) for row in session.exec(stmt)]
     total_result = session.exec(count_stmt).one()
     total = int(_scalar_from_result(total_result) or 0)
     return entries, total
 
 
+def iter_bank_transactions(
+    session: Session,
+    *,
+    start_at: Optional[datetime] = None,
+    end_at: Optional[datetime] = None,
+    search: Optional[str] = None,
+    batch_size: int = 500,
+) -> Iterator[BankTransactionRead]:
+    """Yield the whole filtered ledger in order, fetching rows from the driver in batches."""
+    stmt = _apply_bank_transaction_filters(
+        select(*_BANK_TX_COLUMNS),
+        start_at=start_at,
+        end_at=end_at,
+        search=search,
+    )
+    stmt = stmt.order_by(BankTransaction.created_at.asc(), BankTransaction.id.asc()).execution_options(
+        yield_per=batch_size
+    )
+    for row in session.exec(stmt):
+        yield to_bank_transaction_read(row)
+
+
 def get_bank_ledger(
     session: Session,
     *,
@@ -1471,7 +1554,7 @@ def get_bank_ledger(
         total=total,
         limit=max(1, min(limit, 200)),
         offset=max(0, offset),
-        transactions=[to_bank_transaction_read(entry) for entry in entries],
+        transactions=entries,
     )
 
 
@@ -1563,9 +1646,19 @@ def get_records_by_date(session: Session, start_date: datetime, end_date: dateti
     ).all()
     loan_logs = _latest_operation_map(session, "loan", [loan.id for loan in loan_rows])
     repayment_logs = _latest_operation_map(session, "repayment", [row.id for row in repayment_rows])
-    loans = [to_loan_read(session, loan, loan_logs.get(loan.id)) for loan in loan_rows]
+    loan_balances = _loans_remaining_compounded_balances(session, loan_rows)
+    loans = [
+        to_loan_read(
+            session,
+            loan,
+            loan_logs.get(loan.id),
+            remaining_balance=loan_balances.get(loan.id),
+            resolved_log=True,
+        )
+        for loan in loan_rows
+    ]
     repayments = [
-        to_repayment_read(session, repayment, repayment_logs.get(repayment.id))
+        to_repayment_read(session, repayment, repayment_logs.get(repayment.id), resolved_log=True)
         for repayment in repayment_rows
     ]
     return RecordsResponse(loans=loans, repayments=repayments)
@@ -1581,7 +1674,7 @@ def get_customer_balance_timeline(session: Session, customer_id: int) -> Custome
     ).all()
     serialized: list[BalanceTimelineEvent] = []
     for event in events:
-        metadata = _decode_metadata(event.metadata_json) or {}
+        metadata = event.metadata_json or {}
         serialized.append(
             BalanceTimelineEvent(
                 event_type=event.event_type,
@@ -1602,23 +1695,31 @@ def get_customer_balance_timeline(session: Session, customer_id: int) -> Custome
         events=serialized,
     )
 
-def to_loan_read(session: Session, loan: Loan, latest_log: Optional[OperationLog] = None) -> LoanRead:
+def to_loan_read(
+    session: Session,
+    loan: Loan,
+    latest_log: Optional[OperationLog] = None,
+    *,
+    remaining_balance: Optional[float] = None,
+    resolved_log: bool = False,
+) -> LoanRead:
+    # resolved_log: the caller already looked the log up in bulk, so None means the loan has none
     log = latest_log
-    if log is None and loan.id:
+    if log is None and not resolved_log and loan.id:
         log = (
             session.exec(
                 select(OperationLog)
                 .where(OperationLog.entity_type == "loan", OperationLog.entity_id == loan.id)
                 .order_by(OperationLog.created_at.desc())
+                .limit(1)
             ).first()
         )
-    remaining_balance = None
-    if loan.id:
+    if remaining_balance is None and loan.id:
         remaining_balance = _loan_remaining_compounded_balance(session, loan)
-    return LoanRead(
+    return LoanRead.model_construct(
         id=loan.id,
         loan_code=_ensure_loan_code(session, loan),
-        customer_code=_customer_code_for(session, loan.customer_id),
+        customer_code=(loan.customer.customer_code or "").strip() if loan.customer else "",
         loan_amount=loan.loan_amount,
         processing_fee=loan.processing_fee,
         loan_date=_safe_myt(loan.loan_date, None),
@@ -1626,10 +1727,10 @@ def to_loan_read(session: Session, loan: Loan, latest_log: Optional[OperationLog
         interest_type=loan.interest_type,
         note=loan.note,
         created_at=_safe_myt(loan.created_at, loan.loan_date),
-        updated_at=_safe_myt(getattr(loan, "updated_at", None), loan.loan_date),
-        last_operation_action=getattr(log, "action", None),
-        last_operation_description=getattr(log, "description", None),
-        last_operation_at=_safe_myt(getattr(log, "created_at", None), None),
+        updated_at=_safe_myt(loan.updated_at, loan.loan_date),
+        last_operation_action=log.action if log else None,
+        last_operation_description=log.description if log else None,
+        last_operation_at=_safe_myt(log.created_at, None) if log else None,
         remaining_balance=remaining_balance,
     )
 
@@ -1638,6 +1739,8 @@ def to_repayment_read(
     session: Session,
     repayment: Repayment,
     latest_log: Optional[OperationLog] = None,
+    *,
+    resolved_log: bool = False,
 ) -> RepaymentRead:
     loan_code = None
     if repayment.loan_id:
@@ -1645,15 +1748,16 @@ def to_repayment_read(
         if loan_obj:
             loan_code = _ensure_loan_code(session, loan_obj)
     log = latest_log
-    if log is None and repayment.id:
+    if log is None and not resolved_log and repayment.id:
         log = (
             session.exec(
                 select(OperationLog)
                 .where(OperationLog.entity_type == "repayment", OperationLog.entity_id == repayment.id)
                 .order_by(OperationLog.created_at.desc())
+                .limit(1)
             ).first()
         )
-    return RepaymentRead(
+    return RepaymentRead.model_construct(
         id=repayment.id,
         customer_code=_customer_code_for(session, repayment.customer_id),
         loan_id=repayment.loan_id,
@@ -1662,15 +1766,16 @@ def to_repayment_read(
         repayment_date=_safe_myt(repayment.repayment_date, None),
         note=repayment.note,
         created_at=_safe_myt(repayment.created_at, repayment.repayment_date),
-        updated_at=_safe_myt(getattr(repayment, "updated_at", None), repayment.repayment_date),
-        last_operation_action=getattr(log, "action", None),
-        last_operation_description=getattr(log, "description", None),
-        last_operation_at=_safe_myt(getattr(log, "created_at", None), None),
+        updated_at=_safe_myt(repayment.updated_at, repayment.repayment_date),
+        last_operation_action=log.action if log else None,
+        last_operation_description=log.description if log else None,
+        last_operation_at=_safe_myt(log.created_at, None) if log else None,
     )
 
 
 def to_bank_transaction_read(entry: BankTransaction) -> BankTransactionRead:
-    return BankTransactionRead(
+    # also accepts the lightweight rows selected through _BANK_TX_COLUMNS
+    return BankTransactionRead.model_construct(
         id=entry.id,
         transaction_type=entry.transaction_type,
         amount=entry.amount,
@@ -1684,9 +1789,14 @@ def to_bank_transaction_read(entry: BankTransaction) -> BankTransactionRead:
 
 
 def to_operation_log_read(log: OperationLog, *, customer_code: Optional[str] = None) -> OperationLogRead:
-    metadata = _decode_metadata(log.metadata_json)
-    metadata = _infer_log_i18n_metadata(log, metadata)
-    return OperationLogRead(
+    metadata = log.metadata_json
+    if not isinstance(metadata, dict):
+        # legacy rows may hold NULL or non-object JSON
+        metadata = _infer_log_i18n_metadata(log, None)
+    elif "_i18n_key" not in metadata and "_i18n_list" not in metadata:
+        # rows written before i18n metadata was resolved at insert time
+        metadata = _infer_log_i18n_metadata(log, metadata)
+    return OperationLogRead.model_construct(
         id=log.id,
         entity_type=log.entity_type,
         entity_id=log.entity_id,
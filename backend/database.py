@@ -1,7 +1,10 @@
 import os
 from pathlib import Path
+from sqlalchemy import inspect
 from sqlmodel import SQLModel, create_engine
 
+from .models import OperationLog
+
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -24,8 +27,46 @@ def init_db() -> None:
     """Create database tables if they do not exist."""
     SQLModel.metadata.create_all(engine)
     _migrate_legacy_user_roles()
+    _migrate_json_columns()
+    _ensure_operation_log_indexes()
 
 
 def _migrate_legacy_user_roles() -> None:
     with engine.begin() as connection:
         connection.exec_driver_sql("UPDATE user SET role = 'cs' WHERE role = 'agent'")
+
+
+JSON_COLUMNS = (
+    ("operationlog", "metadata_json"),
+    ("compoundbalanceevent", "metadata_json"),
+    ("user", "permissions_json"),
+)
+
+
+def _migrate_json_columns() -> None:
+    """Convert legacy TEXT payload columns to native JSON so rows are decoded by the driver."""
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table, column in JSON_COLUMNS:
+            columns = {item["name"]: item for item in inspector.get_columns(table)}
+            current = columns.get(column)
+            if current is None or current["type"].__visit_name__.upper() == "JSON":
+                continue
+            # '' and any other text that is not valid JSON would abort the ALTER halfway through startup
+            cleared = connection.exec_driver_sql(
+                f"UPDATE `{table}` SET `{column}` = NULL "
+                f"WHERE `{column}` IS NOT NULL AND NOT JSON_VALID(`{column}`)"
+            ).rowcount
+            if cleared:
+                print(f"Cleared {cleared} invalid JSON value(s) in {table}.{column} before converting it to JSON.")
+            connection.exec_driver_sql(f"ALTER TABLE `{table}` MODIFY `{column}` JSON NULL")
+
+
+def _ensure_operation_log_indexes() -> None:
+    """create_all skips indexes on existing tables, so add newly declared ones here."""
+    table = OperationLog.__table__
+    existing = {item["name"] for item in inspect(engine).get_indexes(table.name)}
+    with engine.begin() as connection:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(connection)
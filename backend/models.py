@@ -1,8 +1,9 @@
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Any, Dict, Optional
 
-from sqlmodel import Field, Relationship, SQLModel
+from sqlalchemy import JSON, Index, text
+from sqlmodel import AutoString, Column, Field, Relationship, SQLModel
 
 from .timezone_utils import now_myt
 
@@ -14,6 +15,11 @@ class UserRole(str, Enum):
     CUSTOMER = "customer"
 
 
+class InterestType(str, Enum):
+    MONTHLY = "月息"
+    DAILY = "日息"
+
+
 class Customer(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     customer_code: str = Field(default="", index=True, unique=True)
@@ -30,7 +36,11 @@ class Customer(SQLModel, table=True):
 
     loans: list["Loan"] = Relationship(back_populates="customer")
     repayments: list["Repayment"] = Relationship(back_populates="customer")
-    balance_events: list["CompoundBalanceEvent"] = Relationship(back_populates="customer")
+    # the timeline is always queried explicitly; fail fast instead of lazily loading the full history
+    balance_events: list["CompoundBalanceEvent"] = Relationship(
+        back_populates="customer",
+        sa_relationship_kwargs={"lazy": "raise"},
+    )
 
 
 class Loan(SQLModel, table=True):
@@ -41,12 +51,16 @@ class Loan(SQLModel, table=True):
     loan_amount: float
     processing_fee: float = 0.0
     interest_rate: float = 0.0
-    interest_type: str = Field(default="月息")
+    # stored as the plain label so existing rows keep working
+    interest_type: InterestType = Field(default=InterestType.MONTHLY, sa_type=AutoString)
     note: Optional[str] = None
     created_at: datetime = Field(default_factory=now_myt)
     updated_at: datetime = Field(default_factory=now_myt)
 
-    customer: Optional[Customer] = Relationship(back_populates="loans")
+    customer: Optional[Customer] = Relationship(
+        back_populates="loans",
+        sa_relationship_kwargs={"lazy": "joined"},
+    )
 
 
 class Repayment(SQLModel, table=True):
@@ -64,12 +78,20 @@ class Repayment(SQLModel, table=True):
 
 
 class OperationLog(SQLModel, table=True):
+    __table_args__ = (
+        # serves the "latest log per entity" lookups without an extra filesort
+        Index("ix_oplog_entity_latest", "entity_type", "entity_id", text("created_at DESC")),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     entity_type: str = Field(index=True)
     entity_id: Optional[int] = Field(default=None, index=True)
     action: str
     description: str = Field(default="")
-    metadata_json: Optional[str] = None
+    # none_as_null keeps "no metadata" as SQL NULL instead of the JSON literal 'null'
+    metadata_json: Optional[Dict[str, Any]] = Field(
+        default=None, sa_column=Column(JSON(none_as_null=True))
+    )
     created_at: datetime = Field(default_factory=now_myt)
 
 
@@ -81,7 +103,9 @@ class CompoundBalanceEvent(SQLModel, table=True):
     change_amount: float
     balance_after: float
     description: Optional[str] = None
-    metadata_json: Optional[str] = None
+    metadata_json: Optional[Dict[str, Any]] = Field(
+        default=None, sa_column=Column(JSON(none_as_null=True))
+    )
 
     customer: Optional[Customer] = Relationship(back_populates="balance_events")
 
@@ -95,9 +119,10 @@ class User(SQLModel, table=True):
     customer_id: Optional[int] = Field(default=None, foreign_key="customer.id")
     created_at: datetime = Field(default_factory=now_myt)
     updated_at: datetime = Field(default_factory=now_myt)
-    permissions_json: Optional[str] = Field(
-        default=None,
-        sa_column_kwargs={"server_default": "'{}'"},
+    # no server default: MySQL rejects a literal default on JSON columns, and the old '{}' grants the
+    # same (nothing) as NULL in get_effective_permissions, which is what legacy and new rows rely on
+    permissions_json: Optional[Dict[str, bool]] = Field(
+        default=None, sa_column=Column(JSON(none_as_null=True))
     )
 
 
@@ -4,7 +4,7 @@ from dataclasses import dataclass
 from typing import Dict, List
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PermissionDefinition:
     key: str
     label: str
@@ -5,7 +5,7 @@ from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, ValidationInfo, Field, field_validator, model_validator
 
-from .models import UserRole
+from .models import InterestType, UserRole
 
 
 def _normalize_optional_customer_code(value: Optional[str]) -> Optional[str]:
@@ -152,8 +152,10 @@ class LoanCreate(BaseModel):
     loan_date: datetime
     processing_fee: float = 0.0
     interest_rate: float = 0.0
-    interest_type: str = "月息"
+    interest_type: InterestType = InterestType.MONTHLY
     note: Optional[str] = None
+    # validate_default lets use_enum_values turn the enum default into its stored label too
+    model_config = ConfigDict(use_enum_values=True, validate_default=True)
 
     @field_validator("loan_date", mode="before")
     @classmethod
@@ -181,14 +183,6 @@ class LoanCreate(BaseModel):
     def validate_loan_date_not_future(cls, value: Optional[datetime]):
         return _ensure_not_future(value, "loan_date")
 
-    @field_validator("interest_type")
-    @classmethod
-    def validate_interest_type(cls, value: str) -> str:
-        allowed = {"月息", "日息"}
-        if value not in allowed:
-            raise ValueError("interest_type must be one of 月息 or 日息")
-        return value
-
     @field_validator("processing_fee")
     @classmethod
     def validate_processing_fee(cls, value: float, info: ValidationInfo):
@@ -229,8 +223,9 @@ class LoanUpdate(BaseModel):
     processing_fee: Optional[float] = None
     loan_date: Optional[datetime] = None
     interest_rate: Optional[float] = None
-    interest_type: Optional[str] = None
+    interest_type: Optional[InterestType] = None
     note: Optional[str] = None
+    model_config = ConfigDict(use_enum_values=True)
 
     @field_validator("loan_date", mode="before")
     @classmethod
@@ -274,16 +269,6 @@ class LoanUpdate(BaseModel):
             raise ValueError("loan_amount must be non-negative")
         return value
 
-    @field_validator("interest_type")
-    @classmethod
-    def validate_interest_type(cls, value: Optional[str]) -> Optional[str]:
-        if value is None:
-            return value
-        allowed = {"月息", "日息"}
-        if value not in allowed:
-            raise ValueError("interest_type must be one of 月息 or 日息")
-        return value
-
 
 class RepaymentCreate(BaseModel):
     customer_code: str
@@ -2,18 +2,50 @@ from __future__ import annotations
 
 import argparse
 import json
-from collections import Counter, defaultdict
+from collections import defaultdict
 from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional
 
+from sqlalchemy import Row, and_, case, func, or_
 from sqlmodel import Session, select
 
 from .. import crud
 from ..database import engine
 from ..models import CompoundBalanceEvent, Customer, Loan, Repayment
 
-
-@dataclass
+try:
+    import orjson
+except ImportError:  # optional: only speeds up large reports
+    orjson = None
+
+AUDIT_BATCH_SIZE = 1000
+# json.dumps builds a fresh encoder whenever options are passed; reuse one for per-issue output
+_DETAILS_ENCODER = json.JSONEncoder(ensure_ascii=False)
+_LOAN_AUDIT_COLUMNS = (
+    Loan.id,
+    Loan.customer_id,
+    Loan.loan_code,
+    Loan.loan_amount,
+    Customer.id.label("known_customer_id"),
+)
+_CUSTOMER_AUDIT_COLUMNS = (
+    Customer.id,
+    Customer.customer_code,
+    Customer.last_principal,
+    Customer.projected_balance,
+)
+_REPAYMENT_AUDIT_COLUMNS = (
+    Repayment.id,
+    Repayment.customer_id,
+    Repayment.loan_id,
+    Repayment.repayment_amount,
+    Customer.id.label("known_customer_id"),
+    Loan.id.label("known_loan_id"),
+    Loan.customer_id.label("loan_customer_id"),
+)
+
+
+@dataclass(slots=True)
 class AuditIssue:
     severity: str
     category: str
@@ -35,7 +67,7 @@ class AuditIssue:
         return payload
 
 
-@dataclass
+@dataclass(slots=True)
 class AuditReport:
     stats: Dict[str, int]
     issues: List[AuditIssue]
@@ -52,246 +84,319 @@ class AuditReport:
         }
 
 
-def run_audit(session: Session, *, tolerance: float = 0.01) -> AuditReport:
-    tolerance = max(tolerance, 0.0)
-    customers = session.exec(select(Customer)).all()
-    loans = session.exec(select(Loan)).all()
-    repayments = session.exec(select(Repayment)).all()
-    events = session.exec(select(CompoundBalanceEvent)).all()
-
-    stats = {
-        "customers": len(customers),
-        "loans": len(loans),
-        "repayments": len(repayments),
-        "balance_events": len(events),
-    }
-
+def _loan_issues(loan: Row, duplicate_loan_codes: FrozenSet[str]) -> List[AuditIssue]:
     issues: List[AuditIssue] = []
-    customer_codes = Counter()
-    for customer in customers:
-        normalized = (customer.customer_code or "").strip().upper()
-        if normalized:
-            customer_codes[normalized] += 1
-
-    loan_codes = Counter()
-    for loan in loans:
-        normalized = (loan.loan_code or "").strip().upper()
-        if normalized:
-            loan_codes[normalized] += 1
-
-    loans_by_customer: Dict[int, List[Loan]] = defaultdict(list)
-    for loan in loans:
-        loans_by_customer[loan.customer_id].append(loan)
-
-    repayments_by_customer: Dict[int, List[Repayment]] = defaultdict(list)
-    for repayment in repayments:
-        repayments_by_customer[repayment.customer_id].append(repayment)
-
-    events_by_customer: Dict[int, List[CompoundBalanceEvent]] = defaultdict(list)
-    for event in events:
-        events_by_customer[event.customer_id].append(event)
+    normalized_code = (loan.loan_code or "").strip().upper()
+    if not normalized_code:
+        issues.append(
+            AuditIssue(
+                severity="error",
+                category="loan_code",
+                entity="loan",
+                entity_id=loan.id,
+                message="loan_code is missing",
+            )
+        )
+    elif normalized_code in duplicate_loan_codes:
+        issues.append(
+            AuditIssue(
+                severity="error",
+                category="loan_code",
+                entity="loan",
+                entity_id=loan.id,
+                message="loan_code is duplicated",
+                details={"loan_code": normalized_code},
+            )
+        )
+    if loan.known_customer_id is None:
+        issues.append(
+            AuditIssue(
+                severity="error",
+                category="loan_reference",
+                entity="loan",
+                entity_id=loan.id,
+                message="customer_id does not point to an existing customer",
+                details={"customer_id": loan.customer_id},
+            )
+        )
+    if loan.loan_amount < 0:
+        issues.append(
+            AuditIssue(
+                severity="error",
+                category="loan_amount",
+                entity="loan",
+                entity_id=loan.id,
+                message="loan_amount cannot be negative",
+                details={"loan_amount": loan.loan_amount},
+            )
+        )
+    return issues
 
-    loan_lookup = {loan.id: loan for loan in loans if loan.id is not None}
 
-    for customer in customers:
-        normalized_code = (customer.customer_code or "").strip().upper()
-        if not normalized_code:
+def _repayment_issues(repayment: Row) -> List[AuditIssue]:
+    issues: List[AuditIssue] = []
+    if repayment.repayment_amount <= 0:
+        issues.append(
+            AuditIssue(
+                severity="error",
+                category="repayment_amount",
+                entity="repayment",
+                entity_id=repayment.id,
+                message="repayment_amount must be positive",
+                details={"repayment_amount": repayment.repayment_amount},
+            )
+        )
+    if repayment.known_customer_id is None:
+        issues.append(
+            AuditIssue(
+                severity="error",
+                category="repayment_reference",
+                entity="repayment",
+                entity_id=repayment.id,
+                message="customer_id does not point to an existing customer",
+                details={"customer_id": repayment.customer_id},
+            )
+        )
+    if repayment.loan_id is not None:
+        if repayment.known_loan_id is None:
             issues.append(
                 AuditIssue(
                     severity="error",
-                    category="customer_code",
-                    entity="customer",
-                    entity_id=customer.id,
-                    message="customer_code is missing",
+                    category="repayment_reference",
+                    entity="repayment",
+                    entity_id=repayment.id,
+                    message="loan_id does not point to an existing loan",
+                    details={"loan_id": repayment.loan_id},
                 )
             )
-        elif customer_codes[normalized_code] > 1:
+        elif repayment.loan_customer_id != repayment.customer_id:
             issues.append(
                 AuditIssue(
                     severity="error",
-                    category="customer_code",
-                    entity="customer",
-                    entity_id=customer.id,
-                    message="customer_code is duplicated",
-                    details={"customer_code": normalized_code},
+                    category="repayment_reference",
+                    entity="repayment",
+                    entity_id=repayment.id,
+                    message="repayment loan_id/customer_id mismatch",
+                    details={
+                        "repayment_customer_id": repayment.customer_id,
+                        "loan_customer_id": repayment.loan_customer_id,
+                        "loan_id": repayment.loan_id,
+                    },
                 )
             )
+    return issues
+
+
+def _normalized_code(column: Any) -> Any:
+    return func.upper(func.trim(func.coalesce(column, "")))
+
+
+def _duplicate_codes(session: Session, column: Any) -> FrozenSet[str]:
+    normalized = _normalized_code(column)
+    rows = session.exec(
+        select(normalized).where(normalized != "").group_by(normalized).having(func.count() > 1)
+    ).all()
+    return frozenset(rows)
+
+
+def _loan_totals_by_customer(session: Session) -> Dict[int, float]:
+    positive_amount = case((Loan.loan_amount > 0, Loan.loan_amount), else_=0.0)
+    compounded = func.round(positive_amount * (1 + crud.COMPOUND_INTEREST_RATE), 2)
+    rows = session.exec(select(Loan.customer_id, func.sum(compounded)).group_by(Loan.customer_id)).all()
+    return {customer_id: float(total or 0.0) for customer_id, total in rows}
+
+
+def _repayment_totals_by_customer(session: Session) -> Dict[int, float]:
+    positive_amount = case((Repayment.repayment_amount > 0, Repayment.repayment_amount), else_=0.0)
+    rows = session.exec(
+        select(Repayment.customer_id, func.sum(positive_amount)).group_by(Repayment.customer_id)
+    ).all()
+    return {customer_id: float(total or 0.0) for customer_id, total in rows}
+
 
-        loan_rows = loans_by_customer.get(customer.id, [])
-        repayment_rows = repayments_by_customer.get(customer.id, [])
-        effective_loan_total = sum(crud._initial_compounded_amount(max(loan.loan_amount, 0.0)) for loan in loan_rows)
-        repayment_total = sum(max(repayment.repayment_amount, 0.0) for repayment in repayment_rows)
+def _latest_event_balances(session: Session) -> Dict[int, float]:
+    rank = func.row_number().over(
+        partition_by=CompoundBalanceEvent.customer_id,
+        order_by=(CompoundBalanceEvent.event_time.desc(), CompoundBalanceEvent.id.desc()),
+    )
+    ranked = select(
+        CompoundBalanceEvent.customer_id,
+        CompoundBalanceEvent.balance_after,
+        rank.label("rn"),
+    ).subquery()
+    rows = session.exec(select(ranked.c.customer_id, ranked.c.balance_after).where(ranked.c.rn == 1)).all()
+    return {customer_id: float(balance_after) for customer_id, balance_after in rows}
+
+
+def _negative_balance_events(session: Session, tolerance: float) -> Dict[int, List[Row]]:
+    rows = session.exec(
+        select(CompoundBalanceEvent.id, CompoundBalanceEvent.customer_id, CompoundBalanceEvent.balance_after)
+        .where(CompoundBalanceEvent.balance_after < -tolerance)
+        .order_by(CompoundBalanceEvent.customer_id, CompoundBalanceEvent.event_time, CompoundBalanceEvent.id)
+    ).all()
+    events: Dict[int, List[Row]] = defaultdict(list)
+    for row in rows:
+        events[row.customer_id].append(row)
+    return events
+
+
+def audit_stats(session: Session) -> Dict[str, int]:
+    return {
+        "customers": session.exec(select(func.count()).select_from(Customer)).one(),
+        "loans": session.exec(select(func.count()).select_from(Loan)).one(),
+        "repayments": session.exec(select(func.count()).select_from(Repayment)).one(),
+        "balance_events": session.exec(select(func.count()).select_from(CompoundBalanceEvent)).one(),
+    }
+
+
+def iter_audit_issues(session: Session, *, tolerance: float = 0.01) -> Iterator[AuditIssue]:
+    # Issues are yielded while each table's cursor is still open, so the session must not run
+    # other statements until the iterator is exhausted.
+    tolerance = max(tolerance, 0.0)
+    duplicate_customer_codes = _duplicate_codes(session, Customer.customer_code)
+    duplicate_loan_codes = _duplicate_codes(session, Loan.loan_code)
+    latest_event_balances = _latest_event_balances(session)
+    negative_events = _negative_balance_events(session, tolerance)
+    loan_totals = _loan_totals_by_customer(session)
+    repayment_totals = _repayment_totals_by_customer(session)
+
+    # Every check except the per-customer balance comparison is answered by SQL, so Python only
+    # touches offending rows plus one streamed pass over customers.
+    customers = session.exec(select(*_CUSTOMER_AUDIT_COLUMNS).execution_options(yield_per=AUDIT_BATCH_SIZE))
+    for customer in customers:
+        normalized_code = (customer.customer_code or "").strip().upper()
+        if not normalized_code:
+            yield AuditIssue(
+                severity="error",
+                category="customer_code",
+                entity="customer",
+                entity_id=customer.id,
+                message="customer_code is missing",
+            )
+        elif normalized_code in duplicate_customer_codes:
+            yield AuditIssue(
+                severity="error",
+                category="customer_code",
+                entity="customer",
+                entity_id=customer.id,
+                message="customer_code is duplicated",
+                details={"customer_code": normalized_code},
+            )
+
+        effective_loan_total = loan_totals.get(customer.id, 0.0)
+        repayment_total = repayment_totals.get(customer.id, 0.0)
         raw_balance = round(max(effective_loan_total - repayment_total, 0.0), 2)
         last_principal = round(float(customer.last_principal or 0.0), 2)
         if abs(last_principal - raw_balance) > tolerance:
-            issues.append(
-                AuditIssue(
+            yield AuditIssue(
+                severity="warning",
+                category="customer_balance",
+                entity="customer",
+                entity_id=customer.id,
+                message="last_principal deviates from recomputed balance",
+                details={
+                    "expected": raw_balance,
+                    "actual": last_principal,
+                },
+            )
+
+        projected = round(max(customer.projected_balance or 0.0, 0.0), 2)
+        if projected < -tolerance:
+            yield AuditIssue(
+                severity="error",
+                category="customer_balance",
+                entity="customer",
+                entity_id=customer.id,
+                message="projected_balance is negative",
+                details={"value": projected},
+            )
+
+        latest_balance = latest_event_balances.get(customer.id)
+        if latest_balance is not None:
+            final_balance = round(latest_balance, 2)
+            if abs(final_balance - projected) > tolerance:
+                yield AuditIssue(
                     severity="warning",
-                    category="customer_balance",
+                    category="balance_events",
                     entity="customer",
                     entity_id=customer.id,
-                    message="last_principal deviates from recomputed balance",
+                    message="latest balance event drift from projected_balance",
                     details={
-                        "expected": raw_balance,
-                        "actual": last_principal,
+                        "event_balance": final_balance,
+                        "projected_balance": projected,
                     },
                 )
-            )
-
-        projected = round(max(customer.projected_balance or 0.0, 0.0), 2)
-        if projected < -tolerance:
-            issues.append(
-                AuditIssue(
+            for entry in negative_events.get(customer.id, []):
+                yield AuditIssue(
                     severity="error",
-                    category="customer_balance",
+                    category="balance_events",
                     entity="customer",
                     entity_id=customer.id,
-                    message="projected_balance is negative",
-                    details={"value": projected},
+                    message="balance event recorded negative balance",
+                    details={
+                        "event_id": entry.id,
+                        "balance_after": entry.balance_after,
+                    },
                 )
-            )
 
-        event_rows = events_by_customer.get(customer.id, [])
-        if event_rows:
-            event_rows.sort(key=lambda event: (event.event_time, event.id or 0))
-            final_balance = round(float(event_rows[-1].balance_after), 2)
-            if abs(final_balance - projected) > tolerance:
-                issues.append(
-                    AuditIssue(
-                        severity="warning",
-                        category="balance_events",
-                        entity="customer",
-                        entity_id=customer.id,
-                        message="latest balance event drift from projected_balance",
-                        details={
-                            "event_balance": final_balance,
-                            "projected_balance": projected,
-                        },
-                    )
-                )
-            for entry in event_rows:
-                if entry.balance_after < -tolerance:
-                    issues.append(
-                        AuditIssue(
-                            severity="error",
-                            category="balance_events",
-                            entity="customer",
-                            entity_id=customer.id,
-                            message="balance event recorded negative balance",
-                            details={
-                                "event_id": entry.id,
-                                "balance_after": entry.balance_after,
-                            },
-                        )
-                    )
-
-    customer_ids = {customer.id for customer in customers}
-
-    for loan in loans:
-        normalized_code = (loan.loan_code or "").strip().upper()
-        if not normalized_code:
-            issues.append(
-                AuditIssue(
-                    severity="error",
-                    category="loan_code",
-                    entity="loan",
-                    entity_id=loan.id,
-                    message="loan_code is missing",
-                )
-            )
-        elif loan_codes[normalized_code] > 1:
-            issues.append(
-                AuditIssue(
-                    severity="error",
-                    category="loan_code",
-                    entity="loan",
-                    entity_id=loan.id,
-                    message="loan_code is duplicated",
-                    details={"loan_code": normalized_code},
-                )
-            )
-        if loan.customer_id not in customer_ids:
-            issues.append(
-                AuditIssue(
-                    severity="error",
-                    category="loan_reference",
-                    entity="loan",
-                    entity_id=loan.id,
-                    message="customer_id does not point to an existing customer",
-                    details={"customer_id": loan.customer_id},
-                )
+    loan_code = _normalized_code(Loan.loan_code)
+    flagged_loans = session.exec(
+        select(*_LOAN_AUDIT_COLUMNS)
+        .outerjoin(Customer, Customer.id == Loan.customer_id)
+        .where(
+            or_(
+                Customer.id.is_(None),
+                Loan.loan_amount < 0,
+                loan_code == "",
+                loan_code.in_(duplicate_loan_codes),
             )
-        if loan.loan_amount < 0:
-            issues.append(
-                AuditIssue(
-                    severity="error",
-                    category="loan_amount",
-                    entity="loan",
-                    entity_id=loan.id,
-                    message="loan_amount cannot be negative",
-                    details={"loan_amount": loan.loan_amount},
-                )
+        )
+        .order_by(Loan.id)
+        .execution_options(yield_per=AUDIT_BATCH_SIZE)
+    )
+    for loan in flagged_loans:
+        yield from _loan_issues(loan, duplicate_loan_codes)
+
+    flagged_repayments = session.exec(
+        select(*_REPAYMENT_AUDIT_COLUMNS)
+        .outerjoin(Customer, Customer.id == Repayment.customer_id)
+        .outerjoin(Loan, Loan.id == Repayment.loan_id)
+        .where(
+            or_(
+                Repayment.repayment_amount <= 0,
+                Customer.id.is_(None),
+                and_(
+                    Repayment.loan_id.is_not(None),
+                    or_(Loan.id.is_(None), Loan.customer_id != Repayment.customer_id),
+                ),
             )
+        )
+        .order_by(Repayment.id)
+        .execution_options(yield_per=AUDIT_BATCH_SIZE)
+    )
+    for repayment in flagged_repayments:
+        yield from _repayment_issues(repayment)
 
-    for repayment in repayments:
-        if repayment.repayment_amount <= 0:
-            issues.append(
-                AuditIssue(
-                    severity="error",
-                    category="repayment_amount",
-                    entity="repayment",
-                    entity_id=repayment.id,
-                    message="repayment_amount must be positive",
-                    details={"repayment_amount": repayment.repayment_amount},
-                )
-            )
-        if repayment.customer_id not in customer_ids:
-            issues.append(
-                AuditIssue(
-                    severity="error",
-                    category="repayment_reference",
-                    entity="repayment",
-                    entity_id=repayment.id,
-                    message="customer_id does not point to an existing customer",
-                    details={"customer_id": repayment.customer_id},
-                )
-            )
-        if repayment.loan_id is not None:
-            loan = loan_lookup.get(repayment.loan_id)
-            if loan is None:
-                issues.append(
-                    AuditIssue(
-                        severity="error",
-                        category="repayment_reference",
-                        entity="repayment",
-                        entity_id=repayment.id,
-                        message="loan_id does not point to an existing loan",
-                        details={"loan_id": repayment.loan_id},
-                    )
-                )
-            elif loan.customer_id != repayment.customer_id:
-                issues.append(
-                    AuditIssue(
-                        severity="error",
-                        category="repayment_reference",
-                        entity="repayment",
-                        entity_id=repayment.id,
-                        message="repayment loan_id/customer_id mismatch",
-                        details={
-                            "repayment_customer_id": repayment.customer_id,
-                            "loan_customer_id": loan.customer_id,
-                            "loan_id": loan.id,
-                        },
-                    )
-                )
 
+def run_audit(session: Session, *, tolerance: float = 0.01) -> AuditReport:
+    stats = audit_stats(session)
+    issues = list(iter_audit_issues(session, tolerance=tolerance))
     return AuditReport(stats=stats, issues=issues)
 
 
+def _dumps(payload: Any, *, indent: bool = False) -> str:
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(payload, option=option).decode("utf-8")
+    if indent:
+        return json.dumps(payload, ensure_ascii=False, indent=2)
+    return _DETAILS_ENCODER.encode(payload)
+
+
 def format_issue(issue: AuditIssue) -> str:
     prefix = f"[{issue.severity.upper()}] {issue.entity}#{issue.entity_id or '-'} {issue.category}"
     if issue.details:
-        return f"{prefix}: {issue.message} | {json.dumps(issue.details, ensure_ascii=False)}"
+        return f"{prefix}: {issue.message} | {_dumps(issue.details)}"
     return f"{prefix}: {issue.message}"
 
 
@@ -318,20 +423,33 @@ def parse_args(argv: Optional[Iterable[str]] = None) -> argparse.Namespace:
         default=0.01,
         help="Allowed rounding difference when comparing balances (default: 0.01)",
     )
-    parser.add_argument(
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument(
         "--json",
         action="store_true",
         help="Print the audit report as JSON",
     )
+    output.add_argument(
+        "--jsonl",
+        action="store_true",
+        help="Stream JSON Lines: a stats line followed by one line per issue",
+    )
     return parser.parse_args(list(argv) if argv is not None else None)
 
 
 def main(argv: Optional[Iterable[str]] = None) -> int:
     args = parse_args(argv)
     with Session(engine) as session:
+        if args.jsonl:
+            print(_dumps({"stats": audit_stats(session)}))
+            issue_count = 0
+            for issue in iter_audit_issues(session, tolerance=args.tolerance):
+                issue_count += 1
+                print(_dumps(issue.as_dict()))
+            return 1 if issue_count else 0
         report = run_audit(session, tolerance=args.tolerance)
     if args.json:
-        print(json.dumps(report.as_dict(), ensure_ascii=False, indent=2))
+        print(_dumps(report.as_dict(), indent=True))
     else:
         print_report(report)
     return 1 if report.issue_count else 0
@@ -2,10 +2,13 @@ from __future__ import annotations
 
 import argparse
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Iterable, List, Sequence, Type
+from typing import Any, Dict, Iterable, List, Sequence, Type
 
-from sqlmodel import SQLModel, Session, create_engine, delete, select
+from pydantic.fields import FieldInfo
+from sqlalchemy import Connection, Insert, Table, delete, insert, select
+from sqlmodel import SQLModel, create_engine
 from ..models import (
     BankTransaction,
     CompoundBalanceEvent,
@@ -19,54 +22,121 @@ from ..models import (
 
 DEFAULT_SQLITE_PATH = (Path(__file__).resolve().parents[1] / "data" / "loan_records.db").resolve()
 
-MIGRATION_ORDER: Sequence[Type[SQLModel]] = (
-    Customer,
-    Loan,
-    Repayment,
-    BankTransaction,
-    CompoundBalanceEvent,
-    OperationLog,
-    User,
-    SessionToken,
+# tables within a level have no foreign keys between each other and are copied concurrently
+MIGRATION_LEVELS: Sequence[Sequence[Type[SQLModel]]] = (
+    (Customer, OperationLog),
+    (Loan, Repayment, BankTransaction, CompoundBalanceEvent, User),
+    (SessionToken,),
 )
 
+MIGRATION_ORDER: Sequence[Type[SQLModel]] = tuple(model for level in MIGRATION_LEVELS for model in level)
+
+_MODELS_BY_TABLE: Dict[str, Type[SQLModel]] = {model.__tablename__: model for model in MIGRATION_ORDER}
+
+
+def _required_column_defaults(model: Type[SQLModel]) -> Dict[str, FieldInfo]:
+    # legacy SQLite rows hold NULL in columns the models now declare NOT NULL (e.g. loan.created_at);
+    # fill those from the field defaults, as constructing the ORM models used to
+    table = model.__table__
+    defaults: Dict[str, FieldInfo] = {}
+    for name, field in model.model_fields.items():
+        column = table.c.get(name)
+        if column is None or column.nullable or column.primary_key:
+            continue
+        if not field.is_required():
+            defaults[name] = field
+    return defaults
+
 
-def _iter_batches(session: Session, model: Type[SQLModel], batch_size: int) -> Iterable[List[SQLModel]]:
-    offset = 0
+def _fill_required_defaults(rows: Sequence[Dict[str, Any]], defaults: Dict[str, FieldInfo]) -> None:
+    for row in rows:
+        for name, field in defaults.items():
+            if row.get(name) is None:
+                row[name] = field.get_default(call_default_factory=True)
+
+
+def _iter_batches(connection: Connection, table: Table, batch_size: int) -> Iterable[List[Dict[str, Any]]]:
+    # keyset pagination: every batch seeks past the last primary key instead of rescanning an OFFSET
+    last_id = 0
     while True:
-        results = session.exec(select(model).offset(offset).limit(batch_size)).all()
+        results = connection.execute(
+            select(table).where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+        ).mappings().all()
         if not results:
             break
-        yield results
-        offset += len(results)
+        last_id = results[-1]["id"]
+        yield [dict(row) for row in results]
 
 
-def _copy_rows(dest_session: Session, model: Type[SQLModel], rows: Sequence[SQLModel]) -> int:
-    for row in rows:
-        payload = row.model_dump()
-        dest_session.add(model(**payload))
-    dest_session.commit()
+def _copy_rows(dest: Connection, statement: Insert, rows: Sequence[Dict[str, Any]]) -> int:
+    if not rows:
+        return 0
+    # plain Core executemany: no ORM instances or validation on either side of the copy
+    dest.execute(statement, rows)
     return len(rows)
 
 
-def migrate(sqlite_url: str, mysql_url: str, batch_size: int, reset_destination: bool) -> None:
+def _set_bulk_load_checks(dest: Connection, *, enabled: bool) -> None:
+    # the source rows are already consistent, so skip per-row FK/unique checks while loading MySQL
+    if dest.dialect.name != "mysql":
+        return
+    flag = 1 if enabled else 0
+    dest.exec_driver_sql(f"SET SESSION foreign_key_checks = {flag}")
+    dest.exec_driver_sql(f"SET SESSION unique_checks = {flag}")
+    dest.commit()
+
+
+def _migrate_table(sqlite_url: str, mysql_url: str, table_name: str, batch_size: int) -> int:
+    # runs in a worker process, so it opens its own engines rather than sharing pooled connections
     sqlite_engine = create_engine(sqlite_url, connect_args={"check_same_thread": False})
     mysql_engine = create_engine(mysql_url)
+    table = SQLModel.metadata.tables[table_name]
+    defaults = _required_column_defaults(_MODELS_BY_TABLE[table_name])
+    total_inserted = 0
+    try:
+        with sqlite_engine.connect() as source, mysql_engine.connect() as dest:
+            _set_bulk_load_checks(dest, enabled=False)
+            try:
+                # built once per table; every batch then hits the engine's compiled-statement cache
+                statement = insert(table)
+                for batch in _iter_batches(source, table, batch_size):
+                    _fill_required_defaults(batch, defaults)
+                    total_inserted += _copy_rows(dest, statement, batch)
+                dest.commit()
+            finally:
+                dest.rollback()
+                _set_bulk_load_checks(dest, enabled=True)
+    finally:
+        sqlite_engine.dispose()
+        mysql_engine.dispose()
+    return total_inserted
+
+
+def migrate(sqlite_url: str, mysql_url: str, batch_size: int, reset_destination: bool, workers: int = 1) -> None:
+    mysql_engine = create_engine(mysql_url)
 
     SQLModel.metadata.create_all(mysql_engine)
 
     if reset_destination:
-        with Session(mysql_engine) as dest:
-            for model in reversed(MIGRATION_ORDER):
-                dest.exec(delete(model))
-            dest.commit()
-
-    with Session(sqlite_engine) as source, Session(mysql_engine) as dest:
-        for model in MIGRATION_ORDER:
-            total_inserted = 0
-            for batch in _iter_batches(source, model, batch_size):
-                total_inserted += _copy_rows(dest, model, batch)
-            print(f"Migrated {total_inserted} rows for {model.__name__}")
+        with mysql_engine.connect() as dest:
+            _set_bulk_load_checks(dest, enabled=False)
+            try:
+                for model in reversed(MIGRATION_ORDER):
+                    dest.execute(delete(model.__table__))
+                dest.commit()
+            finally:
+                dest.rollback()
+                _set_bulk_load_checks(dest, enabled=True)
+    mysql_engine.dispose()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for level in MIGRATION_LEVELS:
+            futures = [
+                (model, pool.submit(_migrate_table, sqlite_url, mysql_url, model.__tablename__, batch_size))
+                for model in level
+            ]
+            for model, future in futures:
+                print(f"Migrated {future.result()} rows for {model.__name__}")
 
     print("Migration completed successfully.")
 
@@ -95,6 +165,12 @@ def build_arg_parser() -> argparse.ArgumentParser:
         default=500,
         help="Number of rows to copy per batch (default: 500)",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of tables copied in parallel within a dependency level (default: 4)",
+    )
     parser.add_argument(
         "--reset-destination",
         action="store_true",
@@ -119,6 +195,7 @@ def main(argv: Sequence[str] | None = None) -> int:
             mysql_url=args.mysql_url,
             batch_size=max(1, args.batch_size),
             reset_destination=args.reset_destination,
+            workers=max(1, args.workers),
         )
     except Exception as exc:  # pragma: no cover - utility script
         print(f"Migration failed: {exc}", file=sys.stderr)
@@ -3,40 +3,111 @@ from __future__ import annotations
 import hashlib
 import os
 import secrets
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, Optional
 
+import bcrypt
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 SECRET_KEY = os.getenv("BACKEND_SECRET_KEY", "change-me")
 JWT_ALGORITHM = os.getenv("BACKEND_JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("BACKEND_ACCESS_TOKEN_MINUTES", "60"))
 REFRESH_TOKEN_EXPIRE_MINUTES = int(os.getenv("BACKEND_REFRESH_TOKEN_MINUTES", "1440"))
 SESSION_EXPIRE_HOURS = int(os.getenv("BACKEND_SESSION_HOURS", "12"))
+BCRYPT_ROUNDS = int(os.getenv("BACKEND_BCRYPT_ROUNDS", "12"))
+PASSWORD_CACHE_TTL_SECONDS = float(os.getenv("BACKEND_PASSWORD_CACHE_SECONDS", "60"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("BACKEND_TOKEN_CACHE_SECONDS", "60"))
+
+
+class _ExpiringCache:
+    """Small thread-safe LRU whose entries carry their own monotonic expiry."""
+
+    def __init__(self, maxsize: int) -> None:
+        self._maxsize = maxsize
+        self._entries: "OrderedDict[Any, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Any, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+
+# successful bcrypt checks only, keyed by a per-process keyed digest so no password material is kept
+_verified_passwords = _ExpiringCache(maxsize=2048)
+_verified_passwords_key = secrets.token_bytes(32)
+_decoded_tokens = _ExpiringCache(maxsize=4096)
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("ascii")
+
+
+def _password_cache_key(password: str, hashed: str) -> bytes:
+    digest = hashlib.blake2b(key=_verified_passwords_key, digest_size=32)
+    digest.update(hashed.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(password.encode("utf-8"))
+    return digest.digest()
 
 
 def verify_password(password: str, hashed: str) -> bool:
     if not password or not hashed:
         return False
-    return pwd_context.verify(password, hashed)
+    cache_key = _password_cache_key(password, hashed)
+    if _verified_passwords.get(cache_key):
+        return True
+    try:
+        matched = bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+    except ValueError:
+        # malformed stored hash
+        return False
+    if not matched:
+        return False
+    _verified_passwords.set(cache_key, True, PASSWORD_CACHE_TTL_SECONDS)
+    return True
 
 
-def create_access_token(data: Dict[str, Any], *, expires_delta: Optional[timedelta] = None) -> str:
+def create_access_token(
+    data: Dict[str, Any],
+    *,
+    expires_delta: Optional[timedelta] = None,
+    now: Optional[datetime] = None,
+) -> str:
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    now = now or datetime.now(timezone.utc)
+    expire = now + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=JWT_ALGORITHM)
 
 
-def create_refresh_token(subject: str, *, expires_minutes: Optional[int] = None) -> str:
-    expire = datetime.now(timezone.utc) + timedelta(minutes=expires_minutes or REFRESH_TOKEN_EXPIRE_MINUTES)
+def create_refresh_token(
+    subject: str,
+    *,
+    expires_minutes: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> str:
+    now = now or datetime.now(timezone.utc)
+    expire = now + timedelta(minutes=expires_minutes or REFRESH_TOKEN_EXPIRE_MINUTES)
     payload = {"sub": subject, "type": "refresh", "exp": expire}
     return jwt.encode(payload, SECRET_KEY, algorithm=JWT_ALGORITHM)
 
@@ -46,15 +117,30 @@ def generate_session_token() -> str:
 
 
 def session_token_hash(raw_token: str) -> str:
+    return hashlib.blake2b(raw_token.encode("utf-8"), digest_size=32).hexdigest()
+
+
+def legacy_session_token_hash(raw_token: str) -> str:
+    # sessions issued before the switch to blake2b; they expire within SESSION_EXPIRE_HOURS
     return hashlib.sha256(raw_token.encode("utf-8")).hexdigest()
 
 
-def session_expiry_datetime() -> datetime:
-    return datetime.now(timezone.utc) + timedelta(hours=SESSION_EXPIRE_HOURS)
+def session_expiry_datetime(*, now: Optional[datetime] = None) -> datetime:
+    return (now or datetime.now(timezone.utc)) + timedelta(hours=SESSION_EXPIRE_HOURS)
 
 
 def decode_token(token: str) -> Dict[str, Any]:
+    cached = _decoded_tokens.get(token)
+    if cached is not None:
+        return dict(cached)
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
     except JWTError as exc:
         raise ValueError("Invalid token") from exc
+    ttl = TOKEN_CACHE_TTL_SECONDS
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        # never serve a cached payload past the token's own expiry
+        ttl = min(ttl, exp - time.time())
+    _decoded_tokens.set(token, payload, ttl)
+    return dict(payload)
@@ -0,0 +1,106 @@
+import os
+import sys
+from pathlib import Path
+
+# Ensure project root is on sys.path so `import backend` works when running the tests directly
+ROOT_DIR = Path(__file__).resolve().parents[2]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from sqlmodel import Session, SQLModel, create_engine
+
+from backend.app import app, get_session, require_admin_context, require_staff_context, StaffContext
+from backend.auth import get_effective_permissions
+from backend.models import User, UserRole
+
+
+@pytest.fixture(scope="session")
+def engine():
+    # schema is created once per run; each test's writes are rolled back (see `connection`).
+    # A named shared-cache memory database lets several connections see the same data, and
+    # the per-worker name keeps `pytest -n auto` (pytest-xdist) workers isolated.
+    worker_id = os.getenv("PYTEST_XDIST_WORKER", "main")
+    engine = create_engine(
+        f"sqlite:///file:testdb_{worker_id}?mode=memory&cache=shared&uri=true",
+        connect_args={"uri": True, "check_same_thread": False},
+        # SQLAlchemy would pick SingletonThreadPool for a memory URI, which closes connections
+        # still in use once the app's worker threads outnumber its pool size
+        poolclass=QueuePool,
+    )
+    # pysqlite's implicit transaction handling breaks SAVEPOINT; let SQLAlchemy emit BEGIN itself
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    # the in-memory database lives only as long as at least one connection stays open
+    keeper = engine.connect()
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    keeper.close()
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def base_client():
+    # Built once and deliberately not entered as a context manager: the app lifespan would run
+    # init_db() against the configured MySQL engine instead of the test database.
+    return TestClient(app)
+
+
+@pytest.fixture(scope="session")
+def staff_user_id(engine):
+    # committed outside the per-test transactions, so it survives every rollback
+    # expire_on_commit=False: reading user.id afterwards must not reload the row with a SELECT
+    with Session(engine, expire_on_commit=False) as session:
+        user = User(username="tester", password_hash="test", role=UserRole.ADMIN, is_active=True)
+        session.add(user)
+        session.commit()
+        return user.id
+
+
+@pytest.fixture
+def connection(engine):
+    # every test runs inside one outer transaction that is rolled back afterwards
+    connection = engine.connect()
+    transaction = connection.begin()
+    yield connection
+    transaction.rollback()
+    connection.close()
+
+
+def _test_session(connection):
+    # commits inside the app only release a SAVEPOINT of the outer test transaction
+    return Session(bind=connection, join_transaction_mode="create_savepoint")
+
+
+@pytest.fixture
+def session(connection):
+    with _test_session(connection) as session:
+        yield session
+
+
+@pytest.fixture
+def client(connection, base_client, staff_user_id):
+    def override_session():
+        with _test_session(connection) as session:
+            yield session
+
+    def override_staff():
+        with _test_session(connection) as session:
+            user = session.get(User, staff_user_id)
+            yield StaffContext(session=session, user=user, permissions=get_effective_permissions(user))
+
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[require_staff_context] = override_staff
+    app.dependency_overrides[require_admin_context] = override_staff
+    base_client.cookies.clear()
+    yield base_client
+    app.dependency_overrides.clear()
@@ -0,0 +1,69 @@
+from datetime import date, datetime
+from typing import Optional, Tuple, Union
+
+from sqlmodel import Session
+
+from backend import crud
+from backend.models import Customer, Loan, Repayment
+
+
+def _as_datetime(value: Optional[Union[date, datetime]]) -> datetime:
+    # mirror the API schemas, which accept a plain date and store midnight of that day
+    if value is None:
+        value = date.today()
+    if isinstance(value, datetime):
+        return value
+    return datetime.combine(value, datetime.min.time())
+
+
+def make_customer(session: Session, **kwargs) -> Customer:
+    kwargs.setdefault("name", "测试顾客")
+    kwargs.setdefault("phone", "0100000000")
+    return crud.create_customer(session, Customer(**kwargs))
+
+
+def make_loan(
+    session: Session,
+    customer: Customer,
+    *,
+    loan_amount: float = 500,
+    loan_date: Optional[Union[date, datetime]] = None,
+    **kwargs,
+) -> Loan:
+    loan = Loan(
+        customer_id=customer.id,
+        loan_amount=loan_amount,
+        loan_date=_as_datetime(loan_date),
+        **kwargs,
+    )
+    return crud.create_loan(session, loan)
+
+
+def make_customer_with_loan(
+    session: Session,
+    *,
+    loan_amount: float = 500,
+    interest_rate: float = 0,
+    **customer_kwargs,
+) -> Tuple[Customer, Loan]:
+    customer = make_customer(session, **customer_kwargs)
+    loan = make_loan(session, customer, loan_amount=loan_amount, interest_rate=interest_rate)
+    return customer, loan
+
+
+def make_repayment(
+    session: Session,
+    loan: Loan,
+    *,
+    repayment_amount: float,
+    repayment_date: Optional[Union[date, datetime]] = None,
+    **kwargs,
+) -> Repayment:
+    repayment = Repayment(
+        customer_id=loan.customer_id,
+        loan_id=loan.id,
+        repayment_amount=repayment_amount,
+        repayment_date=_as_datetime(repayment_date),
+        **kwargs,
+    )
+    return crud.create_repayment(session, repayment)
@@ -1,56 +1,22 @@
-from datetime import date, timedelta
-import sys
-from pathlib import Path
-
-# Ensure project root is on sys.path so `import backend` works when running the test directly
-ROOT_DIR = Path(__file__).resolve().parents[2]
-if str(ROOT_DIR) not in sys.path:
-    sys.path.insert(0, str(ROOT_DIR))
+import json
+from datetime import date, datetime, timedelta
 
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy.pool import StaticPool
-from sqlmodel import Session, SQLModel, create_engine, select
+from sqlalchemy import event
+from sqlmodel import delete, select
 
-from backend.app import app, get_session, require_admin_context, require_staff_context, StaffContext
 from backend import crud
-from backend.models import Customer, User, UserRole
-from backend.timezone_utils import now_myt
-
-
-def get_test_client():
-    engine = create_engine(
-        "sqlite://",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
-    SQLModel.metadata.create_all(engine)
-
-    def override_session():
-        with Session(engine) as session:
-            yield session
-
-    app.dependency_overrides[get_session] = override_session
-
-    def override_staff():
-        with Session(engine) as session:
-            user = session.exec(select(User).where(User.username == "tester")).first()
-            if not user:
-                user = User(username="tester", password_hash="test", role=UserRole.ADMIN, is_active=True)
-                session.add(user)
-                session.commit()
-                session.refresh(user)
-            yield StaffContext(session=session, user=user)
+from backend.models import BankTransaction, Customer, OperationLog, User
+from backend.tests.factories import (
+    make_customer,
+    make_customer_with_loan,
+    make_loan,
+    make_repayment,
+)
+from backend.timezone_utils import MYT, now_myt
 
-    app.dependency_overrides[require_staff_context] = override_staff
-    app.dependency_overrides[require_admin_context] = override_staff
-    client = TestClient(app)
-    client._engine = engine  # type: ignore[attr-defined]
-    return client
 
-
-def test_create_customer_and_summary():
-    client = get_test_client()
+def test_create_customer_and_summary(client):
     customer_payload = {
         "name": "测试顾客",
         "phone": "0123456789",
@@ -99,37 +65,17 @@ def test_create_customer_and_summary():
     assert summary[0]["next_compound_at"] is not None
 
 
-def test_compounded_balance_rolls_forward():
-    client = get_test_client()
-    customer_payload = {
-        "name": "利息测试",
-        "phone": "0190000000",
-    }
-    response = client.post("/api/customers", json=customer_payload)
-    assert response.status_code == 201
-    customer = response.json()
-
-    loan_payload = {
-        "customer_code": customer["customer_code"],
-        "loan_amount": 500,
-        "loan_date": date.today().isoformat(),
-        "interest_rate": 0,
-        "interest_type": "月息",
-    }
-    loan_resp = client.post("/api/loans", json=loan_payload)
-    assert loan_resp.status_code == 201
+def test_compounded_balance_rolls_forward(client, session):
+    customer = make_customer(session, name="利息测试", phone="0190000000")
+    make_loan(session, customer, loan_amount=500)
 
     initial_summary = client.get("/api/summary").json()
     assert initial_summary[0]["projected_balance"] == 600
 
-    with Session(client._engine) as session:  # type: ignore[attr-defined]
-        db_customer = session.exec(
-            select(Customer).where(Customer.customer_code == customer["customer_code"])
-        ).first()
-        assert db_customer is not None
-        db_customer.next_compound_at = now_myt() - timedelta(days=1)
-        session.add(db_customer)
-        session.commit()
+    session.refresh(customer)
+    customer.next_compound_at = now_myt() - timedelta(days=1)
+    session.add(customer)
+    session.commit()
 
     summary_after = client.get("/api/summary").json()
     base_with_initial = round(500 * (1 + crud.COMPOUND_INTEREST_RATE), 2)
@@ -162,37 +108,22 @@ def test_negative_balance_still_adjusts_projected_balance():
     assert next_compound_at is not None
 
 
-def test_manual_balance_adjustment_endpoint():
-    client = get_test_client()
-    response = client.post(
-        "/api/customers",
-        json={"name": "余额调整", "phone": "01122223333"},
-    )
-    customer = response.json()
-    loan_resp = client.post(
-        "/api/loans",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_amount": 400,
-            "loan_date": date.today().isoformat(),
-            "interest_rate": 0,
-            "interest_type": "月息",
-        },
+def test_manual_balance_adjustment_endpoint(client, session):
+    customer, loan = make_customer_with_loan(
+        session, name="余额调整", phone="01122223333", loan_amount=400
     )
-    assert loan_resp.status_code == 201
-    loan = loan_resp.json()
 
     adjust_resp = client.put(
-        f"/api/customers/{customer['id']}/balance",
-        json={"adjust_amount": 100, "loan_code": loan["loan_code"]},
+        f"/api/customers/{customer.id}/balance",
+        json={"adjust_amount": 100, "loan_code": loan.loan_code},
     )
     assert adjust_resp.status_code == 200
     adjusted_customer = adjust_resp.json()
     assert adjusted_customer["projected_balance"] == pytest.approx(580)
 
     override_resp = client.put(
-        f"/api/customers/{customer['id']}/balance",
-        json={"projected_balance": 250, "loan_code": loan["loan_code"]},
+        f"/api/customers/{customer.id}/balance",
+        json={"projected_balance": 250, "loan_code": loan.loan_code},
     )
     assert override_resp.status_code == 200
     override_data = override_resp.json()
@@ -204,80 +135,38 @@ def test_manual_balance_adjustment_endpoint():
     assert summary[0]["projected_balance"] == pytest.approx(250)
 
 
-def test_balance_adjustment_requires_loan_code():
-    client = get_test_client()
-    customer = client.post(
-        "/api/customers",
-        json={"name": "余额校验", "phone": "0171111222"},
-    ).json()
-    client.post(
-        "/api/loans",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_amount": 300,
-            "loan_date": date.today().isoformat(),
-            "interest_rate": 0,
-            "interest_type": "月息",
-        },
-    )
+def test_balance_adjustment_requires_loan_code(client, session):
+    customer = make_customer(session, name="余额校验", phone="0171111222")
+    make_loan(session, customer, loan_amount=300)
     resp = client.put(
-        f"/api/customers/{customer['id']}/balance",
+        f"/api/customers/{customer.id}/balance",
         json={"adjust_amount": 50},
     )
     assert resp.status_code == 422
     detail = resp.json().get("detail")
     assert isinstance(detail, list)
-    assert any(item.get("loc", [])[-1] == "loan_code" for item in detail)
+    # raised by the model-level ensure_balance_reference validator, so it is reported against the body
+    assert any("loan_code is required" in item.get("msg", "") for item in detail)
 
 
-def test_balance_adjustment_rejects_foreign_loan():
-    client = get_test_client()
-    cust_one = client.post(
-        "/api/customers",
-        json={"name": "顾客甲", "phone": "0101000000"},
-    ).json()
-    loan_one = client.post(
-        "/api/loans",
-        json={
-            "customer_code": cust_one["customer_code"],
-            "loan_amount": 500,
-            "loan_date": date.today().isoformat(),
-            "interest_rate": 0,
-            "interest_type": "月息",
-        },
-    ).json()
-    cust_two = client.post(
-        "/api/customers",
-        json={"name": "顾客乙", "phone": "0102000000"},
-    ).json()
+def test_balance_adjustment_rejects_foreign_loan(client, session):
+    cust_one = make_customer(session, name="顾客甲", phone="0101000000")
+    loan_one = make_loan(session, cust_one, loan_amount=500)
+    cust_two = make_customer(session, name="顾客乙", phone="0102000000")
     resp = client.put(
-        f"/api/customers/{cust_two['id']}/balance",
-        json={"adjust_amount": 25, "loan_code": loan_one["loan_code"]},
+        f"/api/customers/{cust_two.id}/balance",
+        json={"adjust_amount": 25, "loan_code": loan_one.loan_code},
     )
     assert resp.status_code == 400
     assert "Loan does not belong" in resp.json()["detail"]
 
 
-def test_delete_loan_rolls_back_balance():
-    client = get_test_client()
-    customer = client.post(
-        "/api/customers",
-        json={"name": "删除借贷", "phone": "012345678"},
-    ).json()
-    loan_resp = client.post(
-        "/api/loans",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_amount": 500,
-            "loan_date": date.today().isoformat(),
-            "interest_rate": 0,
-            "interest_type": "月息",
-        },
+def test_delete_loan_rolls_back_balance(client, session):
+    customer, loan = make_customer_with_loan(
+        session, name="删除借贷", phone="012345678", loan_amount=500
     )
-    assert loan_resp.status_code == 201
-    loan = loan_resp.json()
 
-    delete_resp = client.delete(f"/api/loans/{loan['id']}")
+    delete_resp = client.delete(f"/api/loans/{loan.id}")
     assert delete_resp.status_code == 200
 
     summary = client.get("/api/summary").json()
@@ -285,35 +174,13 @@ def test_delete_loan_rolls_back_balance():
     assert summary[0]["projected_balance"] == pytest.approx(0)
 
 
-def test_delete_repayment_restores_balance():
-    client = get_test_client()
-    customer = client.post(
-        "/api/customers",
-        json={"name": "删除还款", "phone": "019999999"},
-    ).json()
-    loan = client.post(
-        "/api/loans",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_amount": 500,
-            "loan_date": date.today().isoformat(),
-            "interest_rate": 0,
-            "interest_type": "月息",
-        },
-    ).json()
-    repayment_resp = client.post(
-        "/api/repayments",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_code": loan["loan_code"],
-            "repayment_amount": 200,
-            "repayment_date": date.today().isoformat(),
-        },
+def test_delete_repayment_restores_balance(client, session):
+    customer, loan = make_customer_with_loan(
+        session, name="删除还款", phone="019999999", loan_amount=500
     )
-    assert repayment_resp.status_code == 201
-    repayment = repayment_resp.json()
+    repayment = make_repayment(session, loan, repayment_amount=200)
 
-    delete_resp = client.delete(f"/api/repayments/{repayment['id']}")
+    delete_resp = client.delete(f"/api/repayments/{repayment.id}")
     assert delete_resp.status_code == 200
 
     summary = client.get("/api/summary").json()
@@ -322,25 +189,13 @@ def test_delete_repayment_restores_balance():
     assert summary[0]["projected_balance"] == pytest.approx(expected_balance)
 
 
-def test_update_loan_amount_adjusts_projection():
-    client = get_test_client()
-    customer = client.post(
-        "/api/customers",
-        json={"name": "编辑借贷", "phone": "0128888888"},
-    ).json()
-    loan = client.post(
-        "/api/loans",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_amount": 600,
-            "loan_date": date.today().isoformat(),
-            "interest_rate": 0,
-            "interest_type": "月息",
-        },
-    ).json()
+def test_update_loan_amount_adjusts_projection(client, session):
+    customer, loan = make_customer_with_loan(
+        session, name="编辑借贷", phone="0128888888", loan_amount=600
+    )
 
     update_resp = client.put(
-        f"/api/loans/{loan['id']}",
+        f"/api/loans/{loan.id}",
         json={"loan_amount": 400},
     )
     assert update_resp.status_code == 200
@@ -353,34 +208,14 @@ def test_update_loan_amount_adjusts_projection():
     assert summary[0]["projected_balance"] == pytest.approx(expected_projection)
 
 
-def test_update_repayment_amount_adjusts_projection():
-    client = get_test_client()
-    customer = client.post(
-        "/api/customers",
-        json={"name": "编辑还款", "phone": "0107777777"},
-    ).json()
-    loan = client.post(
-        "/api/loans",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_amount": 500,
-            "loan_date": date.today().isoformat(),
-            "interest_rate": 0,
-            "interest_type": "月息",
-        },
-    ).json()
-    repayment = client.post(
-        "/api/repayments",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_code": loan["loan_code"],
-            "repayment_amount": 200,
-            "repayment_date": date.today().isoformat(),
-        },
-    ).json()
+def test_update_repayment_amount_adjusts_projection(client, session):
+    customer, loan = make_customer_with_loan(
+        session, name="编辑还款", phone="0107777777", loan_amount=500
+    )
+    repayment = make_repayment(session, loan, repayment_amount=200)
 
     update_resp = client.put(
-        f"/api/repayments/{repayment['id']}",
+        f"/api/repayments/{repayment.id}",
         json={"repayment_amount": 350},
     )
     assert update_resp.status_code == 200
@@ -393,30 +228,18 @@ def test_update_repayment_amount_adjusts_projection():
     assert summary[0]["projected_balance"] == pytest.approx(expected_projection)
 
 
-def test_repayment_rejected_when_exceeding_loan_balance():
-    client = get_test_client()
-    customer = client.post(
-        "/api/customers",
-        json={"name": "复利校验", "phone": "0105555555"},
-    ).json()
+def test_repayment_rejected_when_exceeding_loan_balance(client, session):
     loan_amount = 500
-    loan = client.post(
-        "/api/loans",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_amount": loan_amount,
-            "loan_date": date.today().isoformat(),
-            "interest_rate": 0,
-            "interest_type": "月息",
-        },
-    ).json()
+    customer, loan = make_customer_with_loan(
+        session, name="复利校验", phone="0105555555", loan_amount=loan_amount
+    )
     max_repay = crud._initial_compounded_amount(loan_amount)
 
     overshoot_resp = client.post(
         "/api/repayments",
         json={
-            "customer_code": customer["customer_code"],
-            "loan_code": loan["loan_code"],
+            "customer_code": customer.customer_code,
+            "loan_code": loan.loan_code,
             "repayment_amount": max_repay + 10,
             "repayment_date": date.today().isoformat(),
         },
@@ -427,8 +250,8 @@ def test_repayment_rejected_when_exceeding_loan_balance():
     full_resp = client.post(
         "/api/repayments",
         json={
-            "customer_code": customer["customer_code"],
-            "loan_code": loan["loan_code"],
+            "customer_code": customer.customer_code,
+            "loan_code": loan.loan_code,
             "repayment_amount": max_repay,
             "repayment_date": date.today().isoformat(),
         },
@@ -438,8 +261,8 @@ def test_repayment_rejected_when_exceeding_loan_balance():
     redundant_resp = client.post(
         "/api/repayments",
         json={
-            "customer_code": customer["customer_code"],
-            "loan_code": loan["loan_code"],
+            "customer_code": customer.customer_code,
+            "loan_code": loan.loan_code,
             "repayment_amount": 1,
             "repayment_date": date.today().isoformat(),
         },
@@ -448,37 +271,17 @@ def test_repayment_rejected_when_exceeding_loan_balance():
     assert "复利余额" in redundant_resp.json()["detail"]
 
 
-def test_repayment_update_cannot_exceed_remaining_balance():
-    client = get_test_client()
-    customer = client.post(
-        "/api/customers",
-        json={"name": "还款调整校验", "phone": "0104444444"},
-    ).json()
+def test_repayment_update_cannot_exceed_remaining_balance(client, session):
     loan_amount = 400
-    loan = client.post(
-        "/api/loans",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_amount": loan_amount,
-            "loan_date": date.today().isoformat(),
-            "interest_rate": 0,
-            "interest_type": "月息",
-        },
-    ).json()
-    repay_one = client.post(
-        "/api/repayments",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_code": loan["loan_code"],
-            "repayment_amount": 200,
-            "repayment_date": date.today().isoformat(),
-        },
-    ).json()
+    customer, loan = make_customer_with_loan(
+        session, name="还款调整校验", phone="0104444444", loan_amount=loan_amount
+    )
+    repay_one = make_repayment(session, loan, repayment_amount=200)
     repay_two = client.post(
         "/api/repayments",
         json={
-            "customer_code": customer["customer_code"],
-            "loan_code": loan["loan_code"],
+            "customer_code": customer.customer_code,
+            "loan_code": loan.loan_code,
             "repayment_amount": crud._initial_compounded_amount(loan_amount) - 200,
             "repayment_date": date.today().isoformat(),
         },
@@ -486,137 +289,63 @@ def test_repayment_update_cannot_exceed_remaining_balance():
     assert repay_two.status_code == 201
 
     increase_resp = client.put(
-        f"/api/repayments/{repay_one['id']}",
+        f"/api/repayments/{repay_one.id}",
         json={"repayment_amount": 210},
     )
     assert increase_resp.status_code == 400
     assert "复利余额" in increase_resp.json()["detail"]
 
     reduce_resp = client.put(
-        f"/api/repayments/{repay_one['id']}",
+        f"/api/repayments/{repay_one.id}",
         json={"repayment_amount": 150},
     )
     assert reduce_resp.status_code == 200
     assert reduce_resp.json()["repayment_amount"] == pytest.approx(150)
 
 
-def test_customer_balance_timeline_includes_disbursement_event():
-    client = get_test_client()
-    customer = client.post(
-        "/api/customers",
-        json={"name": "复利流水", "phone": "0191234567"},
-    ).json()
-    past_date = (date.today() - timedelta(days=90)).isoformat()
-    loan = client.post(
-        "/api/loans",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_amount": 500,
-            "loan_date": past_date,
-            "interest_rate": 0,
-            "interest_type": "月息",
-        },
-    ).json()
+def test_customer_balance_timeline_includes_disbursement_event(client, session):
+    customer = make_customer(session, name="复利流水", phone="0191234567")
+    past_date = date.today() - timedelta(days=90)
+    loan = make_loan(session, customer, loan_amount=500, loan_date=past_date)
 
-    timeline_resp = client.get(f"/api/customers/{customer['id']}/balance-timeline")
+    timeline_resp = client.get(f"/api/customers/{customer.id}/balance-timeline")
     assert timeline_resp.status_code == 200
     timeline = timeline_resp.json()
     event_types = [event["event_type"] for event in timeline["events"]]
     assert "loan_disbursement" in event_types
     disbursement = next(event for event in timeline["events"] if event["event_type"] == "loan_disbursement")
-    expected_change = round(loan["loan_amount"] * (1 + crud.COMPOUND_INTEREST_RATE), 2)
+    expected_change = round(loan.loan_amount * (1 + crud.COMPOUND_INTEREST_RATE), 2)
     assert disbursement["change_amount"] == pytest.approx(expected_change)
     assert timeline["projected_balance"] == pytest.approx(expected_change)
 
 
-def test_repayment_timeline_contains_loan_code_and_previous_balance():
-    client = get_test_client()
-    customer = client.post(
-        "/api/customers",
-        json={"name": "还款流水", "phone": "0192222222"},
-    ).json()
-    loan = client.post(
-        "/api/loans",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_amount": 300,
-            "loan_date": date.today().isoformat(),
-            "interest_rate": 0,
-            "interest_type": "月息",
-        },
-    ).json()
-    repayment = client.post(
-        "/api/repayments",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_code": loan["loan_code"],
-            "repayment_amount": 120,
-            "repayment_date": date.today().isoformat(),
-        },
+def test_repayment_timeline_contains_loan_code_and_previous_balance(client, session):
+    customer, loan = make_customer_with_loan(
+        session, name="还款流水", phone="0192222222", loan_amount=300
     )
-    assert repayment.status_code == 201
+    make_repayment(session, loan, repayment_amount=120)
 
-    timeline = client.get(f"/api/customers/{customer['id']}/balance-timeline").json()
+    timeline = client.get(f"/api/customers/{customer.id}/balance-timeline").json()
     repayment_events = [event for event in timeline["events"] if event["event_type"] == "repayment"]
     assert repayment_events, "Expected at least one repayment event"
     latest = repayment_events[-1]
     metadata = latest.get("metadata") or {}
-    assert metadata.get("loan_code") == loan["loan_code"]
+    assert metadata.get("loan_code") == loan.loan_code
     assert "previous_balance" in metadata
     assert metadata["previous_balance"] >= metadata.get("repayment_amount", 0)
 
 
-def test_overall_report_respects_date_filters():
-    client = get_test_client()
-    customer = client.post(
-        "/api/customers",
-        json={"name": "总报表", "phone": "0188888888"},
-    ).json()
+def test_overall_report_respects_date_filters(client, session):
+    customer = make_customer(session, name="总报表", phone="0188888888")
     today = date.today()
-    recent_date = today.isoformat()
-    old_date = (today - timedelta(days=60)).isoformat()
-
-    recent_loan = client.post(
-        "/api/loans",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_amount": 1000,
-            "processing_fee": 50,
-            "loan_date": recent_date,
-            "interest_rate": 1.0,
-            "interest_type": "月息",
-        },
-    ).json()
-    old_loan = client.post(
-        "/api/loans",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_amount": 400,
-            "processing_fee": 10,
-            "loan_date": old_date,
-            "interest_rate": 1.0,
-            "interest_type": "月息",
-        },
-    ).json()
+    old_date = today - timedelta(days=60)
 
-    client.post(
-        "/api/repayments",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_code": recent_loan["loan_code"],
-            "repayment_amount": 1200,
-            "repayment_date": recent_date,
-        },
-    )
-    client.post(
-        "/api/repayments",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_code": old_loan["loan_code"],
-            "repayment_amount": 300,
-            "repayment_date": old_date,
-        },
+    recent_loan = make_loan(session, customer, loan_amount=1000, processing_fee=50, interest_rate=1.0)
+    old_loan = make_loan(
+        session, customer, loan_amount=400, loan_date=old_date, processing_fee=10, interest_rate=1.0
     )
+    make_repayment(session, recent_loan, repayment_amount=1200)
+    make_repayment(session, old_loan, repayment_amount=300, repayment_date=old_date)
 
     range_resp = client.get(
         "/api/reports/overall",
@@ -647,26 +376,13 @@ def test_overall_report_respects_date_filters():
     assert all_data["net_profit"] == pytest.approx(100)
 
 
-def test_repayment_creation_requires_loan_code():
-    client = get_test_client()
-    customer = client.post(
-        "/api/customers",
-        json={"name": "必需贷款编号", "phone": "0173333444"},
-    ).json()
-    client.post(
-        "/api/loans",
-        json={
-            "customer_code": customer["customer_code"],
-            "loan_amount": 200,
-            "loan_date": date.today().isoformat(),
-            "interest_rate": 0,
-            "interest_type": "月息",
-        },
-    )
+def test_repayment_creation_requires_loan_code(client, session):
+    customer = make_customer(session, name="必需贷款编号", phone="0173333444")
+    make_loan(session, customer, loan_amount=200)
     resp = client.post(
         "/api/repayments",
         json={
-            "customer_code": customer["customer_code"],
+            "customer_code": customer.customer_code,
             "repayment_amount": 50,
             "repayment_date": date.today().isoformat(),
         },
@@ -677,6 +393,99 @@ def test_repayment_creation_requires_loan_code():
     assert any(item.get("loc", [])[-1] == "loan_code" for item in detail)
 
 
+def test_missing_json_columns_are_stored_as_sql_null(session):
+    log = OperationLog(entity_type="customer", action="create")
+    user = User(username="no-permissions", password_hash="x")
+    session.add(log)
+    session.add(user)
+    session.commit()
+
+    assert session.exec(
+        select(OperationLog.id).where(OperationLog.id == log.id, OperationLog.metadata_json.is_(None))
+    ).first() is not None
+    assert session.exec(
+        select(User.id).where(User.id == user.id, User.permissions_json.is_(None))
+    ).first() is not None
+
+
+def test_bank_transactions_export_streams_filtered_ndjson(client, session):
+    for day, amount in ((5, 200), (3, 100), (4, -50), (9, 300)):
+        session.add(
+            BankTransaction(
+                transaction_type="manual_deposit",
+                amount=amount,
+                balance_after=0,
+                created_at=datetime(2024, 1, day, 10, tzinfo=MYT),
+            )
+        )
+    session.commit()
+
+    resp = client.get(
+        "/api/bank/transactions/export",
+        params={"start_date": "2024-01-04", "end_date": "2024-01-05"},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [row["amount"] for row in rows] == [-50, 200]
+
+    bad_resp = client.get("/api/bank/transactions/export", params={"start_date": "not-a-date"})
+    assert bad_resp.status_code == 400
+    assert bad_resp.json()["detail"] == "Invalid start_date"
+
+
+def test_list_loans_without_logs_does_not_query_per_row(connection, session):
+    customer = make_customer(session, name="无日志", phone="0183333333")
+    loans = [make_loan(session, customer, loan_amount=amount) for amount in (100, 200, 300)]
+    make_repayment(session, loans[0], repayment_amount=10)
+    session.exec(delete(OperationLog))
+    session.commit()
+
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(connection, "before_cursor_execute", _record)
+    try:
+        loans = crud.list_loans(session)
+        repayments = crud.list_repayments(session)
+        customer_loans = crud.list_customer_loans(session, customer.id)
+    finally:
+        event.remove(connection, "before_cursor_execute", _record)
+
+    assert len(loans) == 3 and len(repayments) == 1 and len(customer_loans) == 3
+    assert all(loan.last_operation_action is None for loan in loans)
+    # one joined select per listing; no follow-up lookup for rows without a log
+    assert sum("operationlog" in statement.lower() for statement in statements) == 3
+
+
+def test_operation_log_read_only_infers_i18n_for_legacy_rows(session, monkeypatch):
+    written = crud._log_operation(
+        session, entity_type="customer", entity_id=1, action="note", description="自定义备注"
+    )
+    legacy_rows = [
+        OperationLog(entity_type="loan", entity_id=1, action="create", description="x", metadata_json=None),
+        OperationLog(entity_type="loan", entity_id=1, action="create", description="x", metadata_json=["a"]),
+        OperationLog(entity_type="loan", entity_id=1, action="create", description="x", metadata_json="a"),
+    ]
+    calls = []
+    infer = crud._infer_log_i18n_metadata
+
+    def counting_infer(log, metadata):
+        calls.append(log)
+        return infer(log, metadata)
+
+    monkeypatch.setattr(crud, "_infer_log_i18n_metadata", counting_infer)
+
+    assert crud.to_operation_log_read(written).metadata == {"_i18n_key": None}
+    assert calls == []
+    for row in legacy_rows:
+        crud.to_operation_log_read(row)
+    assert calls == legacy_rows
+
+
+
 if __name__ == "__main__":
     import pytest
 
@@ -0,0 +1,21 @@
+from backend import auth, security
+from backend.models import SessionToken
+
+
+def test_legacy_session_token_is_upgraded_and_can_be_revoked(session, staff_user_id):
+    raw_token = security.generate_session_token()
+    record = SessionToken(
+        token_hash=security.legacy_session_token_hash(raw_token),
+        user_id=staff_user_id,
+        expires_at=security.session_expiry_datetime(),
+    )
+    session.add(record)
+    session.commit()
+
+    user = auth.get_user_by_session_token(session, raw_token)
+    assert user is not None and user.id == staff_user_id
+    session.refresh(record)
+    assert record.token_hash == security.session_token_hash(raw_token)
+
+    auth.revoke_session_token(session, raw_token)
+    assert auth.get_user_by_session_token(session, raw_token) is None
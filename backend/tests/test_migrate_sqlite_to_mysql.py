@@ -0,0 +1,41 @@
+from sqlalchemy import text
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from backend.models import Loan
+from backend.scripts.migrate_sqlite_to_mysql import migrate
+
+
+def test_migrate_fills_null_timestamps_from_model_defaults(tmp_path):
+    source_url = f"sqlite:///{tmp_path / 'source.db'}"
+    dest_url = f"sqlite:///{tmp_path / 'dest.db'}"
+    source_engine = create_engine(source_url)
+    with source_engine.begin() as conn:
+        # the legacy loan table predates the timestamp columns, which were added as nullable TEXT
+        conn.execute(text(
+            "CREATE TABLE loan (id INTEGER NOT NULL PRIMARY KEY, customer_id INTEGER NOT NULL, "
+            "loan_date DATETIME NOT NULL, loan_amount FLOAT NOT NULL, interest_rate FLOAT NOT NULL, "
+            "interest_type VARCHAR NOT NULL, note VARCHAR, created_at TEXT, updated_at TEXT, "
+            "loan_code TEXT, processing_fee REAL DEFAULT 0)"
+        ))
+    SQLModel.metadata.create_all(source_engine)
+    with source_engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO customer (id, customer_code, name, phone, created_at, projected_balance, last_principal) "
+            "VALUES (1, 'C1', 'legacy', '0100000000', '2025-01-01 00:00:00', 0, 0)"
+        ))
+        conn.execute(text(
+            "INSERT INTO loan (id, customer_id, loan_date, loan_amount, interest_rate, interest_type, loan_code) "
+            "VALUES (1, 1, '2025-01-01 00:00:00', 500, 0, '月息', 'LN-1')"
+        ))
+    source_engine.dispose()
+
+    migrate(source_url, dest_url, batch_size=10, reset_destination=False, workers=1)
+
+    dest_engine = create_engine(dest_url)
+    with Session(dest_engine) as session:
+        loan = session.exec(select(Loan)).one()
+    dest_engine.dispose()
+    assert loan.loan_code == "LN-1"
+    assert loan.created_at is not None
+    assert loan.updated_at is not None
+    assert loan.processing_fee == 0
@@ -0,0 +1,46 @@
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import bcrypt
+import pytest
+from jose import JWTError
+
+from backend import security
+
+
+def test_failed_password_checks_are_not_cached(monkeypatch):
+    hashed = bcrypt.hashpw(b"right-password", bcrypt.gensalt(rounds=4)).decode("ascii")
+    calls = []
+    checkpw = bcrypt.checkpw
+
+    def counting_checkpw(password, hashed_password):
+        calls.append(password)
+        return checkpw(password, hashed_password)
+
+    monkeypatch.setattr(security.bcrypt, "checkpw", counting_checkpw)
+
+    assert security.verify_password("wrong-password", hashed) is False
+    assert security.verify_password("wrong-password", hashed) is False
+    assert len(calls) == 2
+
+    assert security.verify_password("right-password", hashed) is True
+    assert security.verify_password("right-password", hashed) is True
+    assert len(calls) == 3
+
+
+def test_decoded_token_is_not_served_past_its_expiry(monkeypatch):
+    monkeypatch.setattr(security, "TOKEN_CACHE_TTL_SECONDS", 3600.0)
+    token = security.create_access_token({"sub": "1"}, expires_delta=timedelta(seconds=5))
+    assert security.decode_token(token)["sub"] == "1"
+
+    # move the cache clock past the token's exp and make jose reject it, as it would by then
+    shifted_clock = SimpleNamespace(time=time.time, monotonic=lambda: time.monotonic() + 10)
+    monkeypatch.setattr(security, "time", shifted_clock)
+
+    def expired_decode(*args, **kwargs):
+        raise JWTError("Signature has expired.")
+
+    monkeypatch.setattr(security.jwt, "decode", expired_decode)
+    with pytest.raises(ValueError):
+        security.decode_token(token)
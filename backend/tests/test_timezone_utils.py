@@ -0,0 +1,17 @@
+from datetime import datetime, time
+
+import pytest
+
+from backend.timezone_utils import MYT, parse_myt_range_value
+
+
+@pytest.mark.parametrize("raw", ["2024-01-05", "20240105"])
+def test_plain_date_range_end_covers_the_whole_day(raw):
+    assert parse_myt_range_value(raw) == datetime(2024, 1, 5, tzinfo=MYT)
+    assert parse_myt_range_value(raw, is_range_end=True) == datetime.combine(
+        datetime(2024, 1, 5).date(), time.max, tzinfo=MYT
+    )
+
+
+def test_timestamp_range_value_keeps_its_time():
+    assert parse_myt_range_value("2024-01-05T10:30", is_range_end=True) == datetime(2024, 1, 5, 10, 30, tzinfo=MYT)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from datetime import date, datetime, time, timezone
+from functools import lru_cache
 from typing import Optional, Union
 
 from zoneinfo import ZoneInfo
@@ -18,16 +19,19 @@ def now_myt() -> datetime:
 def ensure_myt_datetime(value: DatetimeLike) -> Optional[datetime]:
     if value is None:
         return None
-    if isinstance(value, date) and not isinstance(value, datetime):
-        return datetime.combine(value, time.min, tzinfo=MYT)
-    if value.tzinfo is None:
-        # treat naive timestamps as already in MYT so we do not shift the value
-        return value.replace(tzinfo=MYT)
-    return value.astimezone(MYT)
+    if isinstance(value, datetime):
+        tz = value.tzinfo
+        if tz is MYT:
+            # already MYT-tagged (e.g. from now_myt); skip the astimezone round-trip
+            return value
+        if tz is None:
+            # treat naive timestamps as already in MYT so we do not shift the value
+            return value.replace(tzinfo=MYT)
+        return value.astimezone(MYT)
+    return datetime.combine(value, time.min, tzinfo=MYT)
 
 
-def to_myt_datetime(value: DatetimeLike) -> Optional[datetime]:
-    return ensure_myt_datetime(value)
+to_myt_datetime = ensure_myt_datetime
 
 
 def format_myt(value: DatetimeLike, fmt: str = "%Y-%m-%d %H:%M") -> str:
@@ -38,6 +42,12 @@ def format_myt(value: DatetimeLike, fmt: str = "%Y-%m-%d %H:%M") -> str:
     converted = to_myt_datetime(value)
     if converted is None:
         return "-"
+    if fmt == "%Y-%m-%d %H:%M":
+        # default used by every timeline/summary row; avoid strftime's format walk
+        return (
+            f"{converted.year:04d}-{converted.month:02d}-{converted.day:02d} "
+            f"{converted.hour:02d}:{converted.minute:02d}"
+        )
     return converted.strftime(fmt)
 
 
@@ -46,13 +56,22 @@ def parse_myt_range_value(raw: str, *, is_range_end: bool = False) -> datetime:
     text = (raw or "").strip()
     if not text:
         raise ValueError("Empty date value")
-    try:
-        # Common case: YYYY-MM-DD input from date pickers
-        parsed_date = date.fromisoformat(text)
-        base_time = time.max if is_range_end else time.min
-        return datetime.combine(parsed_date, base_time, tzinfo=MYT)
-    except ValueError:
-        pass
+    return _parse_myt_range_cached(text, is_range_end)
+
+
+@lru_cache(maxsize=512)
+def _parse_myt_range_cached(text: str, is_range_end: bool) -> datetime:
+    # datetimes are immutable, so report filters can share the parsed value; failures are not cached
+    if len(text) <= 10:
+        # plain dates (YYYY-MM-DD from date pickers, compact YYYYMMDD, ISO weeks); anything carrying
+        # a time part is longer, so full timestamps never pay for the failed date parse
+        try:
+            parsed_date = date.fromisoformat(text)
+        except ValueError:
+            pass
+        else:
+            base_time = time.max if is_range_end else time.min
+            return datetime.combine(parsed_date, base_time, tzinfo=MYT)
     try:
         parsed_dt = datetime.fromisoformat(text)
     except ValueError as exc: